@@ -1,8 +1,8 @@
 #!/bin/bash
 
 # This script is the main entry point for the presentation generation pipeline.
-# It provides commands for the entire workflow, from downloading source
-# documents to building the final presentation.
+# Pipeline stages are run by scripts/pipeline.py, which models them as a
+# dependency graph and only reruns targets whose inputs have changed.
 
 # Navigate to the script's directory to ensure correct file paths
 cd "$(dirname "$0")"
@@ -14,50 +14,50 @@ COMMAND=$1
 shift # Remove the command from the arguments list
 
 case "$COMMAND" in
-  "build-slides")
-    echo "--- Running Slide Generation from JSON ---"
-    python3 build_slides_from_json.py
+  "all"|"download-docs"|"prepare-kb"|"generate-prompt"|"generate-deck"|"extract-images"|"build-slides")
+    echo "--- Bringing '$COMMAND' up to date ---"
+    python3 scripts/pipeline.py "$COMMAND" "$@" || exit 1
     ;;
 
-  "download-docs")
-  echo "===================================================================="
-  echo "INFO: Downloading all documentation from config..."
-  echo "===================================================================="
-  ./doc_downloader/download_all_docs.sh "$@"
-  ;;
-
-  "extract-images")
-    echo "--- Running Image Extraction ---"
-    python3 extract_images.py
+  "validate")
+    echo "--- Validating deck JSON files ---"
+    python3 scripts/validate_decks.py "$@" || exit 1
     ;;
 
-  "generate-prompt")
-    echo "--- Starting Prompt Generation ---"
-    python3 generate_prompt.py
-    echo "--- Prompt Generation Finished ---"
+  "preview")
+    echo "--- Rendering local deck previews ---"
+    python3 scripts/render_preview.py "$@" || exit 1
     ;;
 
-  "map-kb")
-    echo "===================================================================="
-    echo "INFO: Mapping Knowledge Base to workshops.yaml..."
-    echo "===================================================================="
-    python3 map_kb.py
+  "benchmark")
+    echo "--- Running the offline scaling benchmark ---"
+    python3 scripts/benchmark_scaling.py "$@" || exit 1
     ;;
 
-  "prepare-kb")
-    echo "===================================================================="
-    echo "INFO: Preparing Knowledge Base by converting all PDFs to Markdown..."
-    echo "===================================================================="
-    python3 prepare_kb.py
+  "cleanup-drive"|"share-decks")
+    echo "--- Drive housekeeping: $COMMAND ---"
+    python3 scripts/drive_housekeeping.py "${COMMAND%%-*}" "$@" || exit 1
     ;;
+
   *)
-    echo "Usage: $0 [generate-prompt|download-docs|extract-images|build-slides]"
-    echo "  generate-prompt: Builds the prompt file (generated-prompt.md)."
-    echo "  download-docs  : Downloads source PDFs from the config (accepts --no-cache)."
-    echo "  extract-images : Extracts image references from the generated JSON file."
-    echo "  build-slides   : Builds the Google Slides presentation from the JSON file."
+    echo "Usage: $0 [all|download-docs|generate-prompt|generate-deck|validate|preview|extract-images|build-slides|cleanup-drive|share-decks|benchmark] [DECK_OR_AD_PREFIX...] [options]"
+    echo "  all            : Runs every stale stage of the pipeline."
+    echo "  download-docs  : Downloads source PDFs from the config (accepts --no-cache and --cleanup)."
+    echo "  generate-prompt: Builds the prompt files."
+    echo "  generate-deck  : Generates deck JSON from the Explain slides in explain_source/."
+    echo "  validate       : Checks the deck JSON files offline (accepts --skip-images)."
+    echo "  preview        : Renders the decks to local PDFs in previews/ (accepts deck files, --png, --fetch-layouts)."
+    echo "  extract-images : Extracts image references from the generated JSON files."
+    echo "  build-slides   : Builds the Google Slides presentations from the JSON files."
+    echo "  cleanup-drive  : Trashes failed builds and older generations in the Drive output folder (accepts --keep N, --min-age HOURS, --dry-run)."
+    echo "  share-decks    : Shares the latest presentation of each deck (accepts deck names or AD prefixes, --user EMAIL, --domain, --role)."
+    echo "  benchmark      : Measures how extraction, indexing and conversion scale on synthetic data (accepts --scales, --compare)."
+    echo ""
+    echo "Stages only rerun what is out of date; their upstream stages run first when stale."
+    echo "Restrict a run to some decks by file name or AD prefix, e.g. '$0 build-slides OCP-NET'."
+    echo "Options: --force (rerun even if up to date), --dry-run, --jobs N."
     exit 1
     ;;
 esac
 
-echo "--- Process Finished ---"
\ No newline at end of file
+echo "--- Process Finished ---"
@@ -0,0 +1,391 @@
+import os
+import sys
+import json
+import math
+import time
+import glob
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+
+import fitz  # PyMuPDF
+import yaml
+
+# --- Configuration ---
+RESULTS_DIR = "benchmark_results"
+LAYOUTS_FILE = "layouts.yaml"
+STAGES = ['extraction', 'indexing', 'conversion']
+# The base corpus; each dimension is scaled on its own while the others stay at this size.
+BASE_SIZES = {'pages': 20, 'images_per_page': 1, 'references': 10, 'decks': 2}
+DEFAULT_SCALES = [1, 2, 4, 8]
+SOURCE_PDFS = 2
+# A growth exponent above this between the two largest sizes (1.0 = linear) is flagged.
+SUPERLINEAR_EXPONENT = 1.3
+# Below these, timings and memory growth are too small to say anything about scaling.
+MIN_SECONDS = 0.05
+MIN_RSS_GROWTH_MB = 10
+# Slowdown or extra memory against a compared run that is reported as a regression.
+REGRESSION_TOLERANCE = 0.25
+SAMPLE_INTERVAL = 0.01
+WORKSHOP_TITLE = "Benchmark Workshop"
+
+
+# --- Synthetic Corpus ---
+def _write_pdf(path, pages, images_per_page, seed):
+    """Writes a PDF whose pages each hold 'images_per_page' distinct PNG images of varying sizes."""
+    with fitz.open() as doc:
+        for p in range(pages):
+            page = doc.new_page(width=612, height=792)
+            for i in range(images_per_page):
+                n = seed * 100003 + p * images_per_page + i
+                # Distinct pixels and sizes, so PyMuPDF cannot deduplicate the image streams.
+                pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 320 + n % 97, 240 + n % 53), False)
+                pix.clear_with(n % 251)
+                pix.set_pixel(n % pix.width, 0, (n % 256, (n // 256) % 256, 7))
+                top = 36 + i * (700 / images_per_page)
+                page.insert_image(fitz.Rect(36, top, 576, top + 700 / images_per_page - 4), stream=pix.tobytes("png"))
+            page.insert_text((36, 24), f"Synthetic page {p + 1}", fontsize=9)
+        doc.save(path, deflate=True)
+
+
+def _deck(deck_index, sizes):
+    """Builds a deck with one image slide per reference, each tied to an AD, plus citation tags to strip."""
+    slides = [{'layoutClass': 'title', 'title': f"Benchmark Deck {deck_index + 1}", 'subtitle': WORKSHOP_TITLE}]
+    for r in range(sizes['references']):
+        reference = deck_index * sizes['references'] + r
+        slides.append({
+            'layoutClass': 'image_right',
+            'adId': f"BENCH-{r + 1:03d}",
+            'title': f"Decision {r + 1} [cite_start]",
+            'body': [f"- **Point {k + 1}:** synthetic body text for reference {r + 1} [cite: {k + 1}, {r + 1}]" for k in range(4)],
+            'imageReference': {'sourceFile': f"bench-{reference % SOURCE_PDFS}.pdf", 'pageNumber': reference // SOURCE_PDFS % sizes['pages'] + 1},
+        })
+    slides.append({'layoutClass': 'table_fullscreen', 'title': "Summary",
+                   'table': {'headers': ["AD", "Decision"], 'rows': [[f"BENCH-{r + 1:03d}", f"Option {r % 3 + 1}"] for r in range(sizes['references'])]}})
+    return {'workshopTitle': WORKSHOP_TITLE, 'slides': slides}
+
+
+def _layout_cache(layout_names):
+    """A single synthetic layout (title, header, content, body and footer) standing in for every template layout."""
+    def placeholder(object_id, p_type, x, y, width, height):
+        return {'layoutObjectId': object_id, 'type': p_type, 'transform': {'translateX': x, 'translateY': y, 'scaleX': 1, 'scaleY': 1},
+                'size': {'width': {'magnitude': width}, 'height': {'magnitude': height}}}
+    placeholders = [
+        placeholder('title', 'TITLE', 400000, 500000, 8300000, 600000),
+        placeholder('header', 'SUBTITLE', 400000, 100000, 8300000, 300000),
+        placeholder('content', 'SUBTITLE', 4800000, 1200000, 3900000, 3300000),
+        placeholder('body', 'BODY', 400000, 1200000, 8300000, 3300000),
+        placeholder('footer', 'SUBTITLE', 400000, 4700000, 8300000, 300000),
+    ]
+    return {'templateId': 'benchmark', 'themeName': 'benchmark',
+            'pageSize': {'width': {'magnitude': 9144000, 'unit': 'EMU'}, 'height': {'magnitude': 5143500, 'unit': 'EMU'}},
+            'layouts': {name: 'BENCH' for name in layout_names}, 'layoutPlaceholders': {'BENCH': placeholders}}
+
+
+def generate_corpus(workspace, sizes):
+    """
+    Lays out a self-contained project directory: source PDFs, decks, an AD repository,
+    an agenda, layouts.yaml and a layout cache. Returns the input sizes in bytes.
+    """
+    for directory in ['source_documents', 'json_source', 'ad_repository']:
+        os.makedirs(os.path.join(workspace, directory), exist_ok=True)
+    for i in range(SOURCE_PDFS):
+        _write_pdf(os.path.join(workspace, 'source_documents', f"bench-{i}.pdf"), sizes['pages'], sizes['images_per_page'], i)
+    for d in range(sizes['decks']):
+        with open(os.path.join(workspace, 'json_source', f"BENCH-{d + 1:03d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(_deck(d, sizes), f, indent=2)
+
+    ad_ids = [f"BENCH-{r + 1:03d}" for r in range(sizes['references'])]
+    with open(os.path.join(workspace, 'ad_repository', 'BENCH.md'), 'w', encoding='utf-8') as f:
+        f.write("# Benchmark\n\n")
+        for ad_id in ad_ids:
+            f.write(f"## {ad_id}: Synthetic decision\n\n")
+            for label in ['Architectural Question', 'Issue or Problem', 'Alternatives', 'Decision', 'Justification']:
+                f.write(f"**{label}**\n{label} of {ad_id}.\n\n")
+            f.write("---\n\n")
+    with open(os.path.join(workspace, 'agenda.md'), 'w', encoding='utf-8') as f:
+        f.write(f"#### **AM Session: Benchmark**\n\n- **Workshop Topic:** {WORKSHOP_TITLE}\n- **Sub-Topics:**\n")
+        f.writelines(f"  - `{ad_id}`: Synthetic decision\n" for ad_id in ad_ids)
+
+    shutil.copy(LAYOUTS_FILE, workspace)
+    with open(LAYOUTS_FILE, 'r') as f:
+        layout_names = set((yaml.safe_load(f) or {}).get('layout_mapping', {}).values())
+    with open(os.path.join(workspace, 'layout_cache.json'), 'w', encoding='utf-8') as f:
+        json.dump(_layout_cache(layout_names), f)
+
+    def total(pattern):
+        return sum(os.path.getsize(p) for p in glob.glob(os.path.join(workspace, pattern)))
+    return {'pdf_bytes': total('source_documents/*.pdf'), 'deck_bytes': total('json_source/*.json')}
+
+
+# --- Stages ---
+def run_extraction():
+    from extract_images import extract_images_from_json
+    extract_images_from_json()
+
+
+def run_indexing():
+    # Loads the AD repository and agenda, parses every deck and checks each reference against them.
+    from validate_decks import validate_decks, IMAGE_DIRECTORY
+    if not validate_decks(check_images=os.path.isdir(IMAGE_DIRECTORY)):
+        raise RuntimeError("deck validation failed")
+
+
+def run_conversion():
+    # The same work as render_preview.py, in this process so its memory and handles are measured.
+    from render_preview import render_deck, LAYOUTS_FILE, JSON_SOURCE_DIR, DEFAULT_TABLE_FONT_PT
+    from slide_layout import load_layout_cache
+    layout = dict(zip(['layouts', 'layout_placeholders', 'page_size'], load_layout_cache()))
+    with open(LAYOUTS_FILE, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    options = {
+        'class_to_layout_name_map': config.get('layout_mapping', {}),
+        'placeholder_map': config.get('placeholder_mapping', {}),
+        'globals_config': config.get('globals', {}),
+        'default_table_font_size': DEFAULT_TABLE_FONT_PT,
+        'output_dir': 'previews',
+        'png': False,
+        'dpi': 96,
+    }
+    os.makedirs(options['output_dir'], exist_ok=True)
+    for json_file in sorted(glob.glob(os.path.join(JSON_SOURCE_DIR, '*.json'))):
+        render_deck(json_file, layout, options)
+
+
+STAGE_RUNNERS = {'extraction': run_extraction, 'indexing': run_indexing, 'conversion': run_conversion}
+# Modules each stage needs, imported before the baseline so only the work itself is measured.
+STAGE_IMPORTS = {'extraction': ['extract_images'], 'indexing': ['validate_decks'], 'conversion': ['render_preview', 'slide_layout']}
+
+
+# --- Measurement ---
+def _open_files():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def _status_mb(field):
+    """Reads a memory figure (VmRSS, VmHWM) from /proc on Linux."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def _reset_peak_rss():
+    """Resets VmHWM to the current RSS, so import-time peaks do not count towards the stage."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(reset):
+    if reset and (peak := _status_mb('VmHWM')) is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure_stage(stage, workspace, log_level, results):
+    """Runs one stage in a fresh process and reports its wall time, peak RSS and open file handles."""
+    os.chdir(workspace)
+    for module in STAGE_IMPORTS[stage]:
+        __import__(module)
+    # The stage modules configure logging on import; keep the benchmark's own output readable.
+    logging.getLogger().setLevel(log_level)
+
+    reset = _reset_peak_rss()
+    baseline_rss, baseline_files = _status_mb('VmRSS'), _open_files()
+    peak_files, done = baseline_files, threading.Event()
+
+    def sample():
+        nonlocal peak_files
+        while not done.wait(SAMPLE_INTERVAL):
+            if (count := _open_files()) is not None:
+                peak_files = max(peak_files, count)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    error, start = None, time.perf_counter()
+    try:
+        STAGE_RUNNERS[stage]()
+    except BaseException as e:  # extract_images exits the process when validation fails
+        error = f"{e.__class__.__name__}: {e}"
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    open_after = _open_files()
+    result = {'seconds': round(seconds, 4), 'peak_rss_mb': round(_peak_rss_mb(reset), 1), 'baseline_rss_mb': baseline_rss and round(baseline_rss, 1),
+              'peak_open_files': peak_files, 'baseline_open_files': baseline_files,
+              'leaked_open_files': open_after - baseline_files if open_after is not None else None}
+    if baseline_rss is not None:
+        result['rss_growth_mb'] = round(result['peak_rss_mb'] - baseline_rss, 1)
+    if error:
+        result['error'] = error
+    results.put(result)
+
+
+def measure(stage, workspace, log_level):
+    """Measures a stage in a spawned process, so peak RSS and handle counts are its own."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_measure_stage, args=(stage, workspace, log_level, results))
+    process.start()
+    # The result is a small dict, so joining first cannot block on a full pipe.
+    process.join()
+    if results.empty():
+        return {'error': f"stage process died with exit code {process.exitcode}"}
+    return results.get()
+
+
+# --- Analysis ---
+def _exponent(small, large, scale_small, scale_large):
+    if not small or not large or small <= 0 or large <= 0:
+        return None
+    return math.log(large / small) / math.log(scale_large / scale_small)
+
+
+def find_superlinear(cases):
+    """
+    Estimates how each stage grows along each dimension from the two largest sizes,
+    where fixed costs weigh least. Returns the growth exponents and the flagged ones.
+    """
+    growth, flags = [], []
+    for dimension in sorted({c['dimension'] for c in cases}):
+        series = sorted((c for c in cases if c['dimension'] == dimension), key=lambda c: c['scale'])
+        if len(series) < 2:
+            continue
+        small, large = series[-2], series[-1]
+        for stage in large['stages']:
+            a, b = small['stages'].get(stage, {}), large['stages'].get(stage, {})
+            if 'error' in a or 'error' in b:
+                continue
+            entry = {'dimension': dimension, 'stage': stage,
+                     'time_exponent': _exponent(a.get('seconds'), b.get('seconds'), small['scale'], large['scale']),
+                     'memory_exponent': _exponent(a.get('rss_growth_mb'), b.get('rss_growth_mb'), small['scale'], large['scale'])}
+            growth.append(entry)
+            if entry['time_exponent'] and entry['time_exponent'] > SUPERLINEAR_EXPONENT and b['seconds'] >= MIN_SECONDS:
+                flags.append(f"{stage} time grows ~n^{entry['time_exponent']:.2f} with {dimension} ({a['seconds']:.2f}s -> {b['seconds']:.2f}s)")
+            if entry['memory_exponent'] and entry['memory_exponent'] > SUPERLINEAR_EXPONENT and b['rss_growth_mb'] >= MIN_RSS_GROWTH_MB:
+                flags.append(f"{stage} memory grows ~n^{entry['memory_exponent']:.2f} with {dimension} ({a['rss_growth_mb']:.0f}MB -> {b['rss_growth_mb']:.0f}MB)")
+            if b.get('leaked_open_files') and b['leaked_open_files'] > (a.get('leaked_open_files') or 0):
+                flags.append(f"{stage} leaves {b['leaked_open_files']} file handle(s) open with {dimension} x{large['scale']} (x{small['scale']}: {a.get('leaked_open_files') or 0})")
+    return growth, flags
+
+
+def compare_runs(cases, previous_file, tolerance=REGRESSION_TOLERANCE):
+    """Compares each measurement with the same case of an earlier run. Returns the regressions."""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = {(c['dimension'], c['scale']): c for c in json.load(f)['cases']}
+    regressions = []
+    for case in cases:
+        if not (before_case := previous.get((case['dimension'], case['scale']))):
+            continue
+        for stage, now in case['stages'].items():
+            before = before_case['stages'].get(stage)
+            if not before or 'error' in now or 'error' in before:
+                continue
+            label = f"{stage} ({case['dimension']} x{case['scale']})"
+            if now['seconds'] >= MIN_SECONDS and now['seconds'] > before['seconds'] * (1 + tolerance):
+                regressions.append(f"{label}: {before['seconds']:.2f}s -> {now['seconds']:.2f}s")
+            if now['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f"{label}: peak RSS {before['peak_rss_mb']:.0f}MB -> {now['peak_rss_mb']:.0f}MB")
+    return regressions
+
+
+# --- Reporting ---
+def log_case(case):
+    for stage, r in case['stages'].items():
+        if 'error' in r:
+            logging.error(f"    {stage:<11} ❌ {r['error']}")
+            continue
+        logging.info(f"    {stage:<11} {r['seconds']:>8.3f}s  peak RSS {r['peak_rss_mb']:>7.1f}MB (+{r.get('rss_growth_mb', 0):.1f})  "
+                     f"files {r['peak_open_files']} peak, {r['leaked_open_files']} left open")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scaling benchmark of the extraction, indexing and conversion stages on synthetic corpora.")
+    parser.add_argument('--scales', default=",".join(map(str, DEFAULT_SCALES)), help="Comma-separated size multipliers (default: %(default)s).")
+    parser.add_argument('--dimensions', default=",".join(BASE_SIZES), help="Dimensions to scale, one at a time (default: %(default)s).")
+    parser.add_argument('--stages', default=",".join(STAGES), help="Stages to measure (default: %(default)s).")
+    for dimension, size in BASE_SIZES.items():
+        parser.add_argument(f"--{dimension.replace('_', '-')}", type=int, default=size, help=f"Base {dimension.replace('_', ' ')} (default: {size}).")
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help=f"Where to save the results (default: '{RESULTS_DIR}/').")
+    parser.add_argument('--compare', metavar='RESULTS_FILE', help="An earlier results file to compare against.")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help="Relative slowdown or memory increase reported as a regression (default: %(default)s).")
+    parser.add_argument('--keep-workspace', action='store_true', help="Keep the generated corpora for inspection.")
+    parser.add_argument('--verbose', action='store_true', help="Show the stages' own logs.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    scales = sorted({int(s) for s in args.scales.split(',')})
+    dimensions = [d.strip().replace('-', '_') for d in args.dimensions.split(',')]
+    requested = [s.strip() for s in args.stages.split(',')]
+    if unknown := [d for d in dimensions if d not in BASE_SIZES] + [s for s in requested if s not in STAGES]:
+        parser.error(f"unknown dimension(s) or stage(s): {', '.join(unknown)}")
+    # Stages run in pipeline order: indexing checks the images that extraction wrote.
+    stages = [s for s in STAGES if s in requested]
+    base = {dimension: getattr(args, dimension) for dimension in BASE_SIZES}
+    log_level = logging.INFO if args.verbose else logging.WARNING
+
+    cases, root = [], tempfile.mkdtemp(prefix="design-workshops-bench-")
+    try:
+        for dimension in dimensions:
+            for scale in scales:
+                sizes = dict(base, **{dimension: base[dimension] * scale})
+                workspace = os.path.join(root, f"{dimension}-x{scale}")
+                os.makedirs(workspace)
+                logging.info(f"--- {dimension} x{scale}: {sizes} ---")
+                case = {'dimension': dimension, 'scale': scale, 'sizes': sizes, 'inputs': generate_corpus(workspace, sizes), 'stages': {}}
+                for stage in stages:
+                    case['stages'][stage] = measure(stage, workspace, log_level)
+                case['extracted_images'] = len(glob.glob(os.path.join(workspace, 'extracted_images', '*')))
+                log_case(case)
+                cases.append(case)
+    finally:
+        if args.keep_workspace:
+            logging.info(f"Kept the generated corpora in '{root}'.")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    growth, flags = find_superlinear(cases)
+    regressions = compare_runs(cases, args.compare, args.tolerance) if args.compare else []
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.now(timezone.utc)
+    output_file = os.path.join(args.output_dir, f"scaling-{timestamp.strftime('%Y%m%dT%H%M%SZ')}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'createdAt': timestamp.isoformat(timespec='seconds'),
+            'environment': {'python': platform.python_version(), 'pymupdf': fitz.VersionBind, 'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'baseSizes': base, 'scales': scales, 'cases': cases, 'growth': growth, 'superlinear': flags, 'regressions': regressions,
+        }, f, indent=2)
+    logging.info(f"Saved the results to '{output_file}'.")
+
+    for flag in flags:
+        logging.warning(f"❌ Superlinear: {flag}")
+    for regression in regressions:
+        logging.warning(f"❌ Regression against {args.compare}: {regression}")
+    failed = [f"{c['dimension']} x{c['scale']} {stage}" for c in cases for stage, r in c['stages'].items() if 'error' in r]
+    if flags or regressions or failed:
+        sys.exit(1)
+    logging.info("✅ Every stage scales linearly" + (" and no regressions were found." if args.compare else "."))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,9 @@ import yaml
 import re
 import uuid
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
 
 # Google Auth and API Libraries
 from google.auth.transport.requests import Request
@@ -21,6 +22,16 @@ from googleapiclient.http import MediaFileUpload
 # AWS SDK for Python
 import boto3
 
+from validate_decks import validate_decks
+from slides_api import SlidesApi, collect_object_ids, replace_object_ids
+from google_transport import PooledHttp
+from drive_housekeeping import copy_templates, mark_complete
+from deck_json import load_deck
+from slide_layout import (estimate_table_font_size, get_table_area, get_placeholder_bounds,
+                          get_image_aspect_ratio, get_image_placement, get_text_assignments, save_layout_cache)
+import tracing
+from tracing import span
+
 # --- SCRIPT SETUP: LOGGING AND CONFIGURATION ---
 load_dotenv()
 
@@ -48,9 +59,19 @@ except KeyError as e:
 
 SCOPES = ["https://www.googleapis.com/auth/presentations", "https://www.googleapis.com/auth/drive"]
 TOKEN_FILE = 'token.json'
-TABLE_HEIGHT_SAFETY_MARGIN_PERCENT = 0.05 # 5% margin to prevent overlap
+# Worker threads preparing upcoming slides while the current one is sent.
+SLIDE_PREP_WORKERS = int(os.environ.get('SLIDE_PREP_WORKERS', '4'))
+# Shared HTTP connection pool for the Slides and Drive clients.
+GOOGLE_HTTP_POOL_SIZE = int(os.environ.get('GOOGLE_HTTP_POOL_SIZE', '10'))
+GOOGLE_HTTP_TIMEOUT = int(os.environ.get('GOOGLE_HTTP_TIMEOUT', '120'))
+TRACE_FILE = os.environ.get('TRACE_FILE', 'generation_trace.json')
+METRICS_FILE = os.environ.get('METRICS_FILE', 'generation_metrics.prom')
+# Everything the builder reads from a presentation: page size, slide IDs, themes and layout placeholders.
+PRESENTATION_FIELDS = ("pageSize,slides(objectId),masters(objectId,masterProperties(displayName)),"
+                       "layouts(objectId,layoutProperties(displayName,masterObjectId),pageElements(objectId,size,transform,shape(placeholder(type,index))))")
 
 # --- AUTHENTICATION ---
+@tracing.traced('auth')
 def authenticate_google():
     creds = None
     if os.path.exists(TOKEN_FILE):
@@ -64,8 +85,10 @@ def authenticate_google():
         with open(TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
     try:
-        slides_service = build('slides', 'v1', credentials=creds)
-        drive_service = build('drive', 'v3', credentials=creds)
+        # Both services share one thread-safe, pooled transport instead of an httplib2 client each.
+        http = PooledHttp(creds, pool_size=GOOGLE_HTTP_POOL_SIZE, read_timeout=GOOGLE_HTTP_TIMEOUT)
+        slides_service = build('slides', 'v1', http=http)
+        drive_service = build('drive', 'v3', http=http)
         logging.info("✅ Successfully authenticated to Google APIs as user.")
         return slides_service, drive_service
     except Exception as error:
@@ -81,90 +104,62 @@ def get_s3_client():
         logging.critical(f"FATAL: Failed to create AWS S3 client: {e}")
 
 # --- CORE HELPER FUNCTIONS ---
-def fit_table_to_area(slides_service, presentation_id, slide_id, table_id, target_width_emu, target_height_emu, start_font_pt=12):
+def get_table_font_requests(table_id, table_data, font_pt):
+    """Builds the requests applying a font size to every non-empty cell of a table."""
+    non_empty_cells = [
+        {"rowIndex": r, "columnIndex": c}
+        for r, row in enumerate([table_data['headers']] + table_data.get('rows', []))
+        for c, cell_text in enumerate(row)
+        if str(cell_text).strip()
+    ]
+    return [{"updateTextStyle": {
+        "objectId": table_id,
+        "style": {"fontSize": {"magnitude": font_pt, "unit": "PT"}},
+        "fields": "fontSize",
+        "cellLocation": cell_loc
+    }} for cell_loc in non_empty_cells]
+
+@tracing.traced('slide.fit')
+def fit_table_to_area(slides_api, presentation_id, slide_id, table_fit):
     """
-    Calculates the optimal font size for a table by estimating row wraps, then applies it in a single update.
+    Checks the rendered size of a committed table and, if it overflows its target
+    area, applies the font size prepared for it in a single update.
     """
-    MIN_FONT_PT = 8
-    FONT_STEP = 1
-    # Adjusted ratio for a more accurate height estimation per font point.
-    FONT_HEIGHT_RATIO = 25500 
-    # Average characters per line before wrapping. This is an estimate and may need tuning.
-    CHARS_PER_LINE_ESTIMATE = 45 
+    t_id, target_w, target_h, font_pt, font_requests = table_fit
 
+    # Log initial table size before attempting to fit
+    time.sleep(0.7) # Give API a moment to process creation
     try:
-        fields = 'pageElements(objectId,table(rows,columns,tableRows(tableCells(text))))'
-        page = slides_service.presentations().pages().get(presentationId=presentation_id, pageObjectId=slide_id, fields=fields).execute()
-        table_element = next((el for el in page.get('pageElements', []) if el.get('objectId') == table_id), None)
-        
-        if not table_element or not table_element.get('table'):
-            logging.error(f"  - Could not find table '{table_id}' to start fitting process.")
+        fields = 'pageElements(objectId,table(tableRows(rowHeight),tableColumns(columnWidth)))'
+        page = slides_api.get_page(presentation_id, slide_id, fields, 'slide.fit.measure')
+        table_element = next((el for el in page.get('pageElements', []) if el.get('objectId') == t_id), None)
+        if not table_element:
+            logging.error(f"  - Could not find table '{t_id}' to start fitting process.")
             return
 
-        table_info = table_element.get('table', {})
-        num_rows = table_info.get('rows', 0)
-        num_cols = table_info.get('columns', 0)
-        table_rows = table_info.get('tableRows', [])
+        table = table_element['table']
+        width_emu = sum(col.get('columnWidth', {}).get('magnitude', 0) for col in table.get('tableColumns', []))
 
-        non_empty_cells = [
-            {"rowIndex": r, "columnIndex": c}
-            for r, row in enumerate(table_rows)
-            for c, cell in enumerate(row.get('tableCells', []))
-            if cell.get('text', {}).get('textElements')
-        ]
-        
-        # --- Pre-calculate estimated number of lines per row ---
-        estimated_lines_per_row = []
-        for r_idx, row in enumerate(table_rows):
-            max_lines_in_row = 1
-            for c_idx, cell in enumerate(row.get('tableCells', [])):
-                text_content = ""
-                text_elements = cell.get('text', {}).get('textElements', [])
-                for elem in text_elements:
-                    if 'textRun' in elem:
-                        text_content += elem['textRun']['content']
-                
-                # Estimate lines based on character count
-                lines_in_cell = max(1, len(text_content) // (CHARS_PER_LINE_ESTIMATE / num_cols))
-                if lines_in_cell > max_lines_in_row:
-                    max_lines_in_row = lines_in_cell
-            estimated_lines_per_row.append(max_lines_in_row)
+        height_emu = 0
+        for i, row in enumerate(table.get('tableRows', [])):
+            row_height = row.get('rowHeight', {}).get('magnitude', 0)
+            logging.debug("    - Initial Row %d height: %s EMU", i + 1, row_height)
+            height_emu += row_height
 
+        logging.info(f"  - Initial table size: width={int(width_emu)} EMU x height={int(height_emu)} EMU.")
+        if not (height_emu > target_h or width_emu > target_w):
+            logging.info("  - Table fits within target area. No auto-fitting needed.")
+            return
     except HttpError as e:
-        logging.error(f"  - Failed to get initial table info for fitting. Error: {e}")
+        logging.error(f"  - Could not get initial table size for fitting. Error: {e}")
         return
 
-    # --- Mathematical Calculation Loop with Wrapping Estimation ---
-    final_font_pt = start_font_pt
-    for font_pt in range(start_font_pt, MIN_FONT_PT - 1, -FONT_STEP):
-        estimated_row_height = font_pt * FONT_HEIGHT_RATIO
-        
-        # Calculate total height based on estimated lines for each row
-        estimated_total_height = sum(estimated_row_height * lines for lines in estimated_lines_per_row)
-        
-        logging.info(f"  - [Calc] Font: {font_pt}pt -> Estimated Weighted Height: {int(estimated_total_height)} EMU")
-        
-        if estimated_total_height <= target_height_emu:
-            final_font_pt = font_pt
-            logging.info(f"  - Found suitable font size based on wrapping estimation: {final_font_pt}pt.")
-            break
-        else:
-            final_font_pt = MIN_FONT_PT
-
-    # --- Apply the final calculated font size in a single batch ---
-    requests = []
-    for cell_loc in non_empty_cells:
-        requests.append({"updateTextStyle": {
-            "objectId": table_id,
-            "style": {"fontSize": {"magnitude": final_font_pt, "unit": "PT"}},
-            "fields": "fontSize",
-            "cellLocation": cell_loc
-        }})
-    
+    logging.info(f"  - Starting auto-fit for table '{t_id}' into target area: width={int(target_w)} EMU x height={int(target_h)} EMU.")
+    logging.info(f"  - Found suitable font size based on wrapping estimation: {font_pt}pt.")
     try:
-        if requests:
-            slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": requests}).execute()
-            logging.info(f"  ✅ Successfully applied final font size of {final_font_pt}pt to table '{table_id}'.")
+        if font_requests:
+            slides_api.batch_update(presentation_id, font_requests, 'slide.fit.font')
+            logging.info(f"  ✅ Successfully applied final font size of {font_pt}pt to table '{t_id}'.")
     except HttpError as e:
         logging.error(f"  - Failed to apply final font size. Error: {e}")
 
@@ -175,46 +170,41 @@ def load_config():
     except FileNotFoundError:
         logging.critical(f"FATAL: Config file not found: '{LAYOUTS_FILE}'.")
 
-def copy_template_presentation(drive_service, new_title):
-    try:
-        copy_body = {'name': new_title, 'parents': [OUTPUT_FOLDER_ID]}
-        copied_file = drive_service.files().copy(fileId=TEMPLATE_ID, body=copy_body, supportsAllDrives=True).execute()
-        return copied_file.get('id')
-    except HttpError as err:
-        logging.error(f"Failed to copy template: {err}")
-
-def get_theme_and_layouts(slides_service, presentation_id):
+@tracing.traced('theme.lookup')
+def get_theme_and_layouts(slides_api, presentation_id):
     try:
-        presentation = slides_service.presentations().get(presentationId=presentation_id).execute()
+        presentation = slides_api.get_presentation(presentation_id, PRESENTATION_FIELDS, 'theme.lookup')
         target_master = next((m for m in presentation.get('masters', []) if m.get('masterProperties', {}).get('displayName') == TARGET_THEME_NAME), None)
         if not target_master:
             logging.error(f"FATAL: Theme '{TARGET_THEME_NAME}' not found.")
-            return None, None, None
+            return None, None, None, None
         target_master_id = target_master.get('objectId')
-        layouts = {l.get('layoutProperties', {}).get('displayName'): l.get('objectId') for l in presentation.get('layouts', []) if l.get('layoutProperties', {}).get('masterObjectId') == target_master_id}
-        return target_master_id, layouts, presentation.get('pageSize')
+        theme_layouts = [l for l in presentation.get('layouts', []) if l.get('layoutProperties', {}).get('masterObjectId') == target_master_id]
+        layouts = {l.get('layoutProperties', {}).get('displayName'): l.get('objectId') for l in theme_layouts}
+        # Placeholder geometry per layout, so slides can be prepared before they exist.
+        layout_placeholders = {l.get('objectId'): [
+            {'layoutObjectId': el.get('objectId'), 'type': el['shape']['placeholder'].get('type'), 'transform': el.get('transform', {}), 'size': el.get('size', {})}
+            for el in l.get('pageElements', []) if el.get('shape', {}).get('placeholder')
+        ] for l in theme_layouts}
+        return target_master_id, layouts, layout_placeholders, presentation.get('pageSize')
     except HttpError as err:
         logging.error(f"Could not fetch theme info: {err}")
+        return None, None, None, None
 
-def replace_master_slide_text(slides_service, presentation_id, master_id, replacements):
+def replace_master_slide_text(slides_api, presentation_id, master_id, replacements):
     requests = []
     for key, value in replacements.items():
         if isinstance(value, dict) and 'find' in value and 'replace' in value:
             requests.append({"replaceAllText": {"replaceText": value['replace'], "pageObjectIds": [master_id], "containsText": {"text": value['find'], "matchCase": False}}})
     if requests:
-        try: slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": requests}).execute()
+        try: slides_api.batch_update(presentation_id, requests, 'master.replace_text')
         except HttpError as err: logging.warning(f"Could not perform master slide replacements: {err}")
 
-def clean_text_content(text):
-    if not isinstance(text, str):
-        return text
-    # This regex finds and removes all variations of [cite...] tags.
-    return re.sub(r'\[cite.*?\]', '', text).strip()
-
 def get_rich_text_requests(object_id, body_lines):
     requests, plain_text_lines, formatted_lines = [], [], []
     for line in body_lines:
-        cleaned_line = clean_text_content(line)
+        # Citation tags were stripped when the deck was loaded; leading spaces give the nesting level.
+        cleaned_line = line.rstrip()
         stripped = cleaned_line.lstrip()
         is_bullet = stripped.startswith('- ')
         text_for_fmt = stripped.lstrip('- ').strip()
@@ -242,9 +232,11 @@ def get_rich_text_requests(object_id, body_lines):
     return requests
 
 # --- AWS S3 Image Upload ---
+@tracing.traced('s3.upload')
 def upload_image_to_s3(s3_client, image_path, slide_index):
     try:
         object_name = f"presentations/{uuid.uuid4()}-{os.path.basename(image_path)}"
+        tracing.record_api_call(os.path.getsize(image_path))
         s3_client.upload_file(image_path, S3_BUCKET_NAME, object_name, ExtraArgs={'ACL': 'public-read'})
         time.sleep(1) # Add a delay to allow for S3 object propagation
         return f"https://{S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
@@ -252,43 +244,6 @@ def upload_image_to_s3(s3_client, image_path, slide_index):
         logging.error(f"  - Failed to upload image for slide {slide_index+1} to S3. Error: {e}")
 
 # --- INTELLIGENT SIZING AND POSITIONING ---
-def get_placeholder_bounds(placeholders):
-    bounds = {}
-    for p_type, p_list in placeholders.items():
-        if p_list:
-            # Sort by vertical position to correctly identify header/footer from multiple SUBTITLE placeholders
-            p_list.sort(key=lambda p: p['transform'].get('translateY', 0))
-            
-            p = p_list[0] # Use the first element for the primary placeholder type
-            transform = p.get('transform', {})
-            size = p.get('size', {})
-            scale_x = abs(transform.get('scaleX', 1.0))
-            scale_y = abs(transform.get('scaleY', 1.0))
-            effective_width = size.get('width', {}).get('magnitude', 0) * scale_x
-            effective_height = size.get('height', {}).get('magnitude', 0) * scale_y
-            x = transform.get('translateX', 0)
-            y = transform.get('translateY', 0)
-            bounds[p_type] = {'x': x, 'y': y, 'width': effective_width, 'height': effective_height}
-            
-            # Find HEADER and FOOTER from SUBTITLE placeholders if more than one exists
-            if p_type == 'SUBTITLE' and len(p_list) > 1:
-                header, footer = p_list[0], p_list[-1]
-                
-                header_transform = header.get('transform', {})
-                header_size = header.get('size', {})
-                header_scale_x = abs(header_transform.get('scaleX', 1.0)); header_scale_y = abs(header_transform.get('scaleY', 1.0))
-                header_width = header_size.get('width', {}).get('magnitude', 0) * header_scale_x
-                header_height = header_size.get('height', {}).get('magnitude', 0) * header_scale_y
-                bounds['HEADER'] = {'x': header_transform.get('translateX', 0), 'y': header_transform.get('translateY', 0), 'width': header_width, 'height': header_height}
-
-                footer_transform = footer.get('transform', {})
-                footer_size = footer.get('size', {})
-                footer_scale_x = abs(footer_transform.get('scaleX', 1.0)); footer_scale_y = abs(footer_transform.get('scaleY', 1.0))
-                footer_width = footer_size.get('width', {}).get('magnitude', 0) * footer_scale_x
-                footer_height = footer_size.get('height', {}).get('magnitude', 0) * footer_scale_y
-                bounds['FOOTER'] = {'x': footer_transform.get('translateX', 0), 'y': footer_transform.get('translateY', 0), 'width': footer_width, 'height': footer_height}
-    return bounds
-
 def create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size, placeholders, position='fullscreen'):
     json_base_name = image_ref.get("json_file_base")
     image_pattern = f"{json_base_name}-slide_{slide_index+1:02d}.*"
@@ -301,63 +256,8 @@ def create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size
     image_url = upload_image_to_s3(s3_client, image_path, slide_index)
     if not image_url: return None
 
-    try:
-        with fitz.open(image_path) as img_doc:
-            img = img_doc[0]
-            img_width, img_height = img.rect.width, img.rect.height
-            img_aspect_ratio = img_width / img_height if img_height > 0 else 1
-    except Exception as e:
-        logging.error(f"  - Could not get image dimensions for {image_path}. Using default 4:3. Error: {e}")
-        img_aspect_ratio = 4 / 3
-
-    bounds = get_placeholder_bounds(placeholders)
-    page_width, page_height = page_size['width']['magnitude'], page_size['height']['magnitude']
-
-    if position == 'fullscreen':
-        title_bottom = bounds.get('TITLE', {}).get('y', 0) + bounds.get('TITLE', {}).get('height', 0)
-        footer_top = bounds.get('FOOTER', {}).get('y', page_height)
-        
-        available_height = footer_top - title_bottom
-        logging.info(f"  - Calculated target area for '{position}' image: x=0, y={int(title_bottom)}, width={int(page_width)}, height={int(available_height)} (EMU)")
-        final_height = available_height
-        final_width = final_height * img_aspect_ratio
-
-        if final_width > page_width:
-            final_width = page_width
-            final_height = final_width / img_aspect_ratio
-        
-        pos_x = (page_width - final_width) / 2
-        pos_y = title_bottom
-    else:  # left_half for image_right
-        title_bottom = bounds.get('TITLE', {}).get('y', 0) + bounds.get('TITLE', {}).get('height', 0)
-        
-        main_content_subtitle = next((p for p in placeholders.get('SUBTITLE', []) if p['transform'].get('translateY', 0) > title_bottom), None)
-        
-        if main_content_subtitle:
-             main_content_bounds = get_placeholder_bounds({'SUBTITLE': [main_content_subtitle]})['SUBTITLE']
-        elif placeholders.get('BODY'):
-             main_content_bounds = get_placeholder_bounds({'BODY': placeholders['BODY']})['BODY']
-        else:
-             main_content_bounds = {'x': 0, 'y': title_bottom, 'width': page_width, 'height': page_height - title_bottom}
-        
-        available_height = main_content_bounds['height']
-        
-        title_left = bounds.get('TITLE', {}).get('x', 0)
-        main_content_left = main_content_bounds['x']
-        available_width = main_content_left - title_left
-
-        final_height = available_height
-        logging.info(f"  - Calculated target area for '{position}' image: x={int(title_left)}, y={int(main_content_bounds['y'])}, width={int(available_width)}, height={int(available_height)} (EMU)")
-        final_width = final_height * img_aspect_ratio
-        
-        if final_width > available_width:
-            final_width = available_width
-            final_height = final_width / img_aspect_ratio
-
-        pos_x = title_left
-        pos_y = main_content_bounds['y'] + (main_content_bounds['height'] - final_height) / 2
-
-    logging.info(f"  - Calculated image properties: ratio={img_aspect_ratio:.2f}, width={int(final_width)}, height={int(final_height)}, x={int(pos_x)}, y={int(pos_y)}")
+    img_aspect_ratio = get_image_aspect_ratio(image_path)
+    pos_x, pos_y, final_width, final_height = get_image_placement(img_aspect_ratio, page_size, placeholders, position)
     return {"createImage": {"url": image_url, "elementProperties": {"pageObjectId": slide_id, "size": {"width": {"magnitude": int(final_width), "unit": "EMU"}, "height": {"magnitude": int(final_height), "unit": "EMU"}}, "transform": {"scaleX": 1, "scaleY": 1, "translateX": int(pos_x), "translateY": int(pos_y), "unit": "EMU"}}}}
 
 def create_fullscreen_table(slide_id, table_data, page_size, target_width_emu, target_height_emu, top_y_offset):
@@ -373,7 +273,7 @@ def create_fullscreen_table(slide_id, table_data, page_size, target_width_emu, t
     
     # Headers with conditional insert/style and font size
     for c, header in enumerate(table_data['headers']):
-        header_text = clean_text_content(header)
+        header_text = str(header).strip()
         if header_text:
             requests.append({"insertText": {"objectId": table_id, "cellLocation": {"rowIndex": 0, "columnIndex": c}, "text": header_text}})
             requests.append({"updateTextStyle": {"objectId": table_id, "cellLocation": {"rowIndex": 0, "columnIndex": c}, "style": {"bold": True}, "fields": "bold"}})
@@ -381,7 +281,7 @@ def create_fullscreen_table(slide_id, table_data, page_size, target_width_emu, t
     # Body cells
     for r, row_data in enumerate(table_data.get('rows', [])):
         for c, cell_text in enumerate(row_data):
-            cell_text_clean = clean_text_content(str(cell_text))
+            cell_text_clean = str(cell_text).strip()
             if cell_text_clean:
                 requests.append({"insertText": {"objectId": table_id, "cellLocation": {"rowIndex": r + 1, "columnIndex": c}, "text": cell_text_clean}})
     
@@ -396,154 +296,195 @@ def create_fullscreen_table(slide_id, table_data, page_size, target_width_emu, t
     return requests, table_id
 
 # --- Main Slide Creation Logic ---
-def add_slide_to_presentation(slides_service, drive_service, s3_client, presentation_id, slide_index, slide_data, layout_map, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size=12):
+def prepare_slide(s3_client, slide_index, slide_data, layout_map, layout_placeholders, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size=12):
+    """
+    Prepares everything a slide needs without calling the Slides API: object IDs,
+    placeholder geometry from the cached layout, the image upload and placement,
+    the rich-text and table requests, and the fitted table font. Safe to run on a
+    worker thread while earlier slides are being committed.
+    """
     layout_class, layout_name = slide_data.get('layoutClass', 'default'), class_to_layout_name_map.get(slide_data.get('layoutClass', 'default'))
-    if not (layout_id := layout_map.get(layout_name)): return
+    if not (layout_id := layout_map.get(layout_name)): return None
 
     slide_id = f"slide_{slide_index}_{uuid.uuid4()}"
-    try:
-        slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": [{"createSlide": {"objectId": slide_id, "slideLayoutReference": {"layoutId": layout_id}}}]}).execute()
-        logging.info(f"  - Created slide {slide_index+1}/{slide_data.get('total_slides')} (class: {layout_class})")
-    except HttpError as err:
-        logging.error(f"  - Failed to create slide {slide_index+1}. Error: {err}")
-        return
 
-    page_elements = slides_service.presentations().pages().get(presentationId=presentation_id, pageObjectId=slide_id).execute().get('pageElements', [])
-    
+    # Name the slide's placeholders up front, so content requests can target them in the same batch as createSlide.
     placeholders = {p_type: [] for p_type in ['TITLE', 'SUBTITLE', 'BODY', 'PICTURE', 'FOOTER']}
-    for el in page_elements:
-        if ph := el.get('shape', {}).get('placeholder'):
-            if (p_type := ph.get('type')) in placeholders:
-                placeholders[p_type].append({'objectId': el.get('objectId'), 'transform': el.get('transform', {}), 'size': el.get('size', {})})
-
-    if layout_class in ['image_right', 'image_fullscreen', 'table_fullscreen']:
-        # Detailed logging for placeholders on complex slides
-        bounds_for_logging = get_placeholder_bounds(placeholders)
-        for p_type, bound in bounds_for_logging.items():
-            logging.info(f"  - Placeholder '{p_type}' bounds: "
-                         f"x={int(bound['x'])}, y={int(bound['y'])}, "
-                         f"width={int(bound['width'])}, height={int(bound['height'])}")
-
-    content_requests, image_ref = [], slide_data.get("imageReference")
+    id_mappings, placeholder_ids = [], {}
+    for ph in layout_placeholders.get(layout_id, []):
+        if ph['type'] in placeholders:
+            object_id = f"ph_{uuid.uuid4().hex}"
+            id_mappings.append({"layoutPlaceholderObjectId": ph['layoutObjectId'], "objectId": object_id})
+            placeholder_ids[object_id] = ph['layoutObjectId']
+            placeholders[ph['type']].append({'objectId': object_id, 'transform': ph['transform'], 'size': ph['size']})
+    create_request = {"createSlide": {"objectId": slide_id, "slideLayoutReference": {"layoutId": layout_id}, "placeholderIdMappings": id_mappings}}
+
+    if layout_class in ['image_right', 'image_fullscreen', 'table_fullscreen'] and logging.getLogger().isEnabledFor(logging.DEBUG):
+        # Detailed logging for placeholders on complex slides; the bounds are only computed when DEBUG is on.
+        for p_type, bound in get_placeholder_bounds(placeholders).items():
+            logging.debug("  - Placeholder '%s' bounds: x=%d, y=%d, width=%d, height=%d", p_type, bound['x'], bound['y'], bound['width'], bound['height'])
+
+    # Text and the image or table are kept apart, so the fallback in commit_slide() can send them separately.
+    content_requests, element_requests, image_ref = [], [], slide_data.get("imageReference")
     if image_ref: image_ref["json_file_base"] = slide_data.get("json_file_base")
-    body_placeholder_type = placeholder_map.get(layout_class, {}).get('body_placeholder', 'BODY')
     table_to_check = None
 
-    if 'title' in slide_data and placeholders.get('TITLE'):
-        content_requests.append({"insertText": {"objectId": placeholders['TITLE'][0]['objectId'], "text": clean_text_content(slide_data['title'])}})
+    for placeholder, role, content in get_text_assignments(slide_data, layout_class, placeholders, placeholder_map, globals_config):
+        if role == 'body':
+            content_requests.extend(get_rich_text_requests(placeholder['objectId'], content))
+        else:
+            content_requests.append({"insertText": {"objectId": placeholder['objectId'], "text": content}})
 
-    if placeholders.get('SUBTITLE'):
-        placeholders['SUBTITLE'].sort(key=lambda x: x['transform'].get('translateY', 0))
-        subs = placeholders['SUBTITLE']
-        
-        # Check if subtitle from JSON exists
-        if slide_data.get('subtitle'):
-            # The main subtitle is usually the one that is NOT a header or footer. Find it.
-            title_bottom = get_placeholder_bounds(placeholders).get('TITLE', {}).get('y', 0)
-            main_sub = next((s for s in subs if s['transform'].get('translateY', 0) > title_bottom), subs[0])
-            content_requests.append({"insertText": {"objectId": main_sub['objectId'], "text": clean_text_content(slide_data['subtitle'])}})
-
-        # Handle global header/footer, avoiding overwriting the main subtitle
-        if layout_class not in ['title', 'closing']:
-            if globals_config.get('header') and len(subs) > 0: content_requests.append({"insertText": {"objectId": subs[0]['objectId'], "text": globals_config['header']}})
-            footer_id = (placeholders.get('FOOTER') or [{}])[0].get('objectId') or (subs[-1]['objectId'] if len(subs) > 1 else None)
-            if globals_config.get('footer') and footer_id: content_requests.append({"insertText": {"objectId": footer_id, "text": globals_config['footer']}})
-    
-    if layout_class == 'columns':
-        body_content = slide_data.get('body', [])
-        bold_titles = [i for i, line in enumerate(body_content) if line.strip().startswith('**')]
-        split_index = bold_titles[1] if len(bold_titles) > 1 else -1
-        
-        left_body, right_body = (body_content[:split_index], body_content[split_index:]) if split_index != -1 else (body_content, [])
-        body_placeholders = sorted(placeholders.get('BODY', []), key=lambda p: p['transform'].get('translateX', 0))
-
-        if len(body_placeholders) > 0 and left_body:
-            content_requests.extend(get_rich_text_requests(body_placeholders[0]['objectId'], left_body))
-        if len(body_placeholders) > 1 and right_body:
-            content_requests.extend(get_rich_text_requests(body_placeholders[1]['objectId'], right_body))
-
-    elif layout_class == "image_fullscreen" and image_ref:
-        if img_req := create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size, placeholders, 'fullscreen'): content_requests.append(img_req)
-    elif layout_class == 'image_right':
-        if 'body' in slide_data and placeholders.get(body_placeholder_type):
-            rightmost_subtitle = sorted(placeholders[body_placeholder_type], key=lambda x: x['transform'].get('translateX', 0), reverse=True)[0]
-            content_requests.extend(get_rich_text_requests(rightmost_subtitle['objectId'], slide_data['body']))
-        if image_ref:
-            if img_req := create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size, placeholders, 'left_half'): content_requests.append(img_req)
+    if layout_class == "image_fullscreen" and image_ref:
+        if img_req := create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size, placeholders, 'fullscreen'): element_requests.append(img_req)
+    elif layout_class == 'image_right' and image_ref:
+        if img_req := create_image_on_slide(s3_client, slide_id, slide_index, image_ref, page_size, placeholders, 'left_half'): element_requests.append(img_req)
     elif layout_class == "table_fullscreen" and 'table' in slide_data:
-        bounds = get_placeholder_bounds(placeholders)
-        page_width, page_height = page_size['width']['magnitude'], page_size['height']['magnitude']
+        area = get_table_area(placeholders, page_size)
+        effective_target_height = area['effective_height']
+        table_requests, table_id = create_fullscreen_table(slide_id, slide_data['table'], page_size, area['width'], effective_target_height, area['y'])
+        if table_requests:
+            element_requests.extend(table_requests)
+            font_pt = estimate_table_font_size(slide_data['table'], effective_target_height, default_table_font_size)
+            table_to_check = (table_id, area['width'], effective_target_height, font_pt, get_table_font_requests(table_id, slide_data['table'], font_pt))
+            
+    return {
+        'slide_id': slide_id,
+        'layout_class': layout_class,
+        'create_request': create_request,
+        'placeholder_ids': placeholder_ids,
+        'content_requests': content_requests,
+        'element_requests': element_requests,
+        'speaker_notes': slide_data['speakerNotes'].strip() if 'speakerNotes' in slide_data else None,
+        'table_fit': table_to_check,
+    }
+
+def retarget_placeholder_requests(slides_api, presentation_id, slide_id, placeholder_ids, content_requests):
+    """
+    Points content requests at the placeholders of a slide created without
+    placeholderIdMappings: the IDs chosen in prepare_slide() are matched, through
+    their layout placeholder, to the IDs the API assigned. Requests for a
+    placeholder the slide does not have are dropped.
+    """
+    fields = 'pageElements(objectId,shape(placeholder(parentObjectId)))'
+    page = slides_api.get_page(presentation_id, slide_id, fields, 'slide.placeholders')
+    assigned = {el['shape']['placeholder']['parentObjectId']: el['objectId'] for el in page.get('pageElements', [])
+                if el.get('shape', {}).get('placeholder', {}).get('parentObjectId')}
+    id_map = {object_id: assigned[layout_id] for object_id, layout_id in placeholder_ids.items() if layout_id in assigned}
+    missing = set(placeholder_ids) - set(id_map)
+    kept = [r for r in content_requests if not (collect_object_ids(r) & missing)]
+    if len(kept) < len(content_requests):
+        logging.warning(f"  - Dropped {len(content_requests) - len(kept)} request(s) for placeholders the new slide does not have.")
+    return replace_object_ids(kept, id_map)
+
+
+def commit_slide(slides_api, presentation_id, slide_index, prepared, total_slides):
+    """
+    Sends a prepared slide to the presentation: createSlide and all content go in one
+    batch. If that batch is rejected, the slide is created on its own, without the
+    placeholder ID mappings, then its text is sent to the placeholders it actually
+    got and its image or table in a batch of their own, so a bad element or mapping
+    does not lose the rest of the slide.
+    """
+    slide_id, content_requests, element_requests = prepared['slide_id'], prepared['content_requests'], prepared['element_requests']
+    try:
+        with span('slide.commit', requests=len(content_requests) + len(element_requests) + 1):
+            slides_api.batch_update(presentation_id, [prepared['create_request']] + content_requests + element_requests, 'slide.commit')
+        logging.info(f"  - Created slide {slide_index+1}/{total_slides} (class: {prepared['layout_class']})")
+    except HttpError as err:
+        logging.warning(f"  - Batched creation of slide {slide_index+1} failed, retrying step by step. Error: {err}")
+        create_slide = {k: v for k, v in prepared['create_request']['createSlide'].items() if k != 'placeholderIdMappings'}
+        try:
+            with span('slide.create'):
+                slides_api.batch_update(presentation_id, [{"createSlide": create_slide}], 'slide.create')
+            logging.info(f"  - Created slide {slide_index+1}/{total_slides} (class: {prepared['layout_class']})")
+        except HttpError as err:
+            logging.error(f"  - Failed to create slide {slide_index+1}. Error: {err}")
+            return False
+        if content_requests:
+            try:
+                with span('slide.populate', requests=len(content_requests)):
+                    content_requests = retarget_placeholder_requests(slides_api, presentation_id, slide_id, prepared['placeholder_ids'], content_requests)
+                    slides_api.batch_update(presentation_id, content_requests, 'slide.populate')
+            except HttpError as err:
+                logging.error(f"  - Failed to populate slide {slide_index+1}. Error: {err}")
+        if element_requests:
+            try:
+                with span('slide.elements', requests=len(element_requests)):
+                    slides_api.batch_update(presentation_id, element_requests, 'slide.elements')
+            except HttpError as err:
+                logging.error(f"  - Failed to add the image or table of slide {slide_index+1}. Error: {err}")
+                # The table fit below would only fail on the missing table.
+                return True
+
+    if prepared['table_fit']:
+        fit_table_to_area(slides_api, presentation_id, slide_id, prepared['table_fit'])
+    return True
+
+@tracing.traced('slide.notes')
+def insert_speaker_notes(slides_api, presentation_id, notes_by_slide):
+    """
+    Fills in the speaker notes of all committed slides with one read and one batch
+    update. If that batch is rejected, the notes are sent slide by slide, so one bad
+    request does not lose the notes of the whole deck.
+    """
+    if not notes_by_slide: return
+    try:
+        fields = 'slides(objectId,slideProperties(notesPage(notesProperties(speakerNotesObjectId))))'
+        presentation = slides_api.get_presentation(presentation_id, fields, 'slide.notes.lookup')
+    except HttpError as err:
+        logging.error(f"  - Failed to look up the speaker notes. Error: {err}")
+        return
+    requests = {}
+    for position, slide in enumerate(presentation.get('slides', []), start=1):
+        notes_id = slide.get('slideProperties', {}).get('notesPage', {}).get('notesProperties', {}).get('speakerNotesObjectId')
+        if notes_id and (notes := notes_by_slide.get(slide.get('objectId'))):
+            requests[position] = {"insertText": {"objectId": notes_id, "text": notes}}
+    if not requests: return
+    try:
+        slides_api.batch_update(presentation_id, list(requests.values()), 'slide.notes')
+    except HttpError as err:
+        logging.warning(f"  - Batched speaker notes failed, inserting them slide by slide. Error: {err}")
+        for position, request in requests.items():
+            try:
+                slides_api.batch_update(presentation_id, [request], 'slide.notes.single')
+            except HttpError as err:
+                logging.error(f"  - Failed to insert the speaker notes of slide {position}. Error: {err}")
 
-        target_width_emu = page_width - (2 * 360000) # Standard side margins
-        title_bounds = bounds.get('TITLE')
-        footer_bounds = bounds.get('FOOTER')
-        
-        top_y_offset = 0; target_height_emu = page_height
-        if title_bounds: top_y_offset = title_bounds.get('y', 0) + title_bounds.get('height', 0)
-        if footer_bounds: target_height_emu = footer_bounds.get('y', page_height) - top_y_offset
-        else: target_height_emu = page_height - top_y_offset # Fallback if no footer
-        
-        pos_x = (page_width - target_width_emu) / 2
+def build_slides(slides_api, s3_client, presentation_id, slides, json_file_base, layout_map, layout_placeholders, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size=12):
+    """
+    Builds a deck's slides as a pipeline: worker threads prepare slides (S3 uploads,
+    image probing, request building, table fitting) while a single committer sends
+    them to the presentation strictly in slide order.
+    """
+    deck_span = tracing.current_span()
 
-        # Apply safety margin
-        effective_target_height = target_height_emu * (1 - TABLE_HEIGHT_SAFETY_MARGIN_PERCENT)
-        logging.info(f"  - Calculated target area for table: "
-                     f"x={int(pos_x)}, y={int(top_y_offset)}, "
-                     f"width={int(target_width_emu)}, height={int(target_height_emu)} (EMU)")
-        logging.info(f"  - Applying {TABLE_HEIGHT_SAFETY_MARGIN_PERCENT*100}% safety margin. Effective height: {int(effective_target_height)} EMU")
+    def prepare(i, slide_data):
+        with span('slide.prepare', parent=deck_span, deck=json_file_base, slide=i + 1):
+            return prepare_slide(s3_client, i, slide_data, layout_map, layout_placeholders, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size)
 
+    for slide_data in slides:
+        slide_data['json_file_base'] = json_file_base
 
-        table_requests, table_id = create_fullscreen_table(slide_id, slide_data['table'], page_size, target_width_emu, effective_target_height, top_y_offset)
-        if table_requests:
-            content_requests.extend(table_requests)
-            table_to_check = (slide_id, table_id, target_width_emu, effective_target_height, default_table_font_size)
-    else:
-        if 'body' in slide_data and placeholders.get(body_placeholder_type) and placeholders[body_placeholder_type]:
-            content_requests.extend(get_rich_text_requests(placeholders[body_placeholder_type][0]['objectId'], slide_data['body']))
-            
-    if 'speakerNotes' in slide_data:
-        notes_page = slides_service.presentations().pages().get(presentationId=presentation_id, pageObjectId=slide_id).execute()
-        if notes_id := notes_page.get('slideProperties', {}).get('notesPage', {}).get('notesProperties', {}).get('speakerNotesObjectId'):
-            content_requests.append({"insertText": {"objectId": notes_id, "text": clean_text_content(slide_data['speakerNotes'])}})
+    notes_by_slide = {}
+    with ThreadPoolExecutor(max_workers=SLIDE_PREP_WORKERS) as executor:
+        futures = [executor.submit(prepare, i, slide_data) for i, slide_data in enumerate(slides)]
 
-    if content_requests:
-        try:
-            slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": content_requests}).execute()
-        except HttpError as err:
-            logging.error(f"  - Failed to populate slide {slide_index+1}. Error: {err}")
+        for i, future in enumerate(futures):
+            try:
+                prepared = future.result()
+            except Exception as e:
+                logging.error(f"  - Failed to prepare slide {i+1}. Error: {e}", exc_info=True)
+                continue
+            if not prepared: continue
+            with span('slide', deck=json_file_base, slide=i + 1, layoutClass=prepared['layout_class']):
+                if commit_slide(slides_api, presentation_id, i, prepared, len(slides)) and prepared['speaker_notes']:
+                    notes_by_slide[prepared['slide_id']] = prepared['speaker_notes']
 
-    if table_to_check:
-        s_id, t_id, target_w, target_h, start_font = table_to_check
-        
-        # Log initial table size before attempting to fit
-        time.sleep(0.7) # Give API a moment to process creation
-        try:
-            fields = 'pageElements(objectId,table(tableRows(rowHeight),tableColumns(columnWidth)))'
-            page = slides_service.presentations().pages().get(presentationId=presentation_id, pageObjectId=s_id, fields=fields).execute()
-            table_element = next((el for el in page.get('pageElements', []) if el.get('objectId') == t_id), None)
-            if table_element:
-                table = table_element['table']
-                width_emu = sum(col.get('columnWidth', {}).get('magnitude', 0) for col in table.get('tableColumns', []))
-                
-                height_emu = 0
-                for i, row in enumerate(table.get('tableRows', [])):
-                    row_height = row.get('rowHeight', {}).get('magnitude', 0)
-                    logging.info(f"    - Initial Row {i+1} height: {row_height} EMU")
-                    height_emu += row_height
-                
-                logging.info(f"  - Initial table size: width={int(width_emu)} EMU x height={int(height_emu)} EMU.")
-                
-                if height_emu > target_h or width_emu > target_w:
-                    logging.info(f"  - Starting auto-fit for table '{t_id}' into target area: width={int(target_w)} EMU x height={int(target_h)} EMU.")
-                    fit_table_to_area(slides_service, presentation_id, s_id, t_id, target_w, target_h, start_font)
-                else:
-                    logging.info("  - Table fits within target area. No auto-fitting needed.")
-
-        except HttpError as e:
-            logging.error(f"  - Could not get initial table size for fitting. Error: {e}")
-
-
-def get_default_font_size(slides_service, presentation_id, layout_map, class_to_layout_name_map):
+    insert_speaker_notes(slides_api, presentation_id, notes_by_slide)
+
+
+def get_default_font_size(slides_api, presentation_id, layout_map, class_to_layout_name_map):
     """Creates a temporary slide to determine default table font size and returns it."""
     
     table_layout_name = class_to_layout_name_map.get('table_fullscreen')
@@ -562,10 +503,10 @@ def get_default_font_size(slides_service, presentation_id, layout_map, class_to_
             {"createTable": {"objectId": table_id, "elementProperties": {"pageObjectId": slide_id}, "rows": 1, "columns": 1}},
             {"insertText": {"objectId": table_id, "cellLocation": {"rowIndex": 0, "columnIndex": 0}, "text": "test"}}
         ]
-        slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": requests}).execute()
+        slides_api.batch_update(presentation_id, requests, 'font_probe.create')
 
         fields = "pageElements(objectId,table(tableRows(tableCells(text(textElements(textRun(style(fontSize))))))))"
-        page = slides_service.presentations().pages().get(presentationId=presentation_id, pageObjectId=slide_id, fields=fields).execute()
+        page = slides_api.get_page(presentation_id, slide_id, fields, 'font_probe.read')
         table_element = next((el for el in page.get('pageElements', []) if el.get('objectId') == table_id), None)
         
         if table_element:
@@ -581,7 +522,7 @@ def get_default_font_size(slides_service, presentation_id, layout_map, class_to_
         logging.error(f"Could not determine default font size. Using fallback. Error: {e}")
     finally:
         try:
-            slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": [{"deleteObject": {"objectId": slide_id}}]}).execute()
+            slides_api.batch_update(presentation_id, [{"deleteObject": {"objectId": slide_id}}], 'font_probe.delete')
         except Exception as e:
             logging.warning(f"Could not delete temporary slide. Please remove it manually. Error: {e}")
             
@@ -589,52 +530,101 @@ def get_default_font_size(slides_service, presentation_id, layout_map, class_to_
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Builds Google Slides presentations from deck JSON files.")
+    parser.add_argument('files', nargs='*', help=f"Deck JSON files. Defaults to every file in '{SOURCE_DIRECTORY}/'.")
+    parser.add_argument('--profile', action='store_true', help="Log the slowest slides, phases and Slides API transfer per call site when the build finishes.")
+    parser.add_argument('--results', help="File to write the list of deck files built successfully to, so a caller building several decks knows which ones failed.")
+    args = parser.parse_args()
+
     logging.info("--- Initializing JSON to Slides Builder ---")
+
+    # Build the given deck files, or every deck in the source directory.
+    json_files = args.files or sorted(glob.glob(os.path.join(SOURCE_DIRECTORY, '*.json')))
+
+    # Fail fast on deck problems, before any template copy, upload or API call.
+    if not validate_decks(json_files): sys.exit(1)
     
     slides_service, drive_service = authenticate_google()
     s3_client = get_s3_client()
     if not all([slides_service, drive_service, s3_client]): sys.exit(1)
+    slides_api = SlidesApi(slides_service)
 
     config = load_config()
     if not config: sys.exit(1)
     
     class_to_layout_name_map, placeholder_map, globals_config = config.get('layout_mapping', {}), config.get('placeholder_mapping', {}), config.get('globals', {})
     default_table_font_size = 12
+    failed_files, completed_ids = [], []
 
-    for json_file in glob.glob(os.path.join(SOURCE_DIRECTORY, '*.json')):
-        logging.info(f"\n--- Processing file: {os.path.basename(json_file)} ---")
+    decks = {}
+    for json_file in json_files:
         try:
-            with open(json_file, 'r', encoding='utf-8') as f: presentation_data = json.load(f)
-            workshop_title, slides = presentation_data.get("workshopTitle", "Untitled"), presentation_data.get("slides", [])
-            if not slides: continue
+            presentation_data = load_deck(json_file)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"❌ Could not read {json_file}. Error: {e}")
+            failed_files.append(json_file)
+            continue
+        if presentation_data.get("slides"):
+            decks[json_file] = presentation_data
+
+    # One batched Drive round trip copies the template for every deck.
+    try:
+        copies = copy_templates(drive_service, TEMPLATE_ID, OUTPUT_FOLDER_ID,
+                                {os.path.splitext(os.path.basename(f))[0]: d.get("workshopTitle", "Untitled") for f, d in decks.items()})
+    except HttpError as err:
+        logging.critical(f"FATAL: Failed to copy the template. Error: {err}")
+        sys.exit(1)
 
-            globals_config['header'] = workshop_title
-            presentation_id = copy_template_presentation(drive_service, f"Generated - {workshop_title}")
-            if not presentation_id: raise Exception("Failed to copy template.")
+    for json_file, presentation_data in decks.items():
+        logging.info(f"\n--- Processing file: {os.path.basename(json_file)} ---")
+        with span('deck', deck=os.path.basename(json_file)):
+            try:
+                workshop_title, slides = presentation_data.get("workshopTitle", "Untitled"), presentation_data["slides"]
+                json_file_base = os.path.splitext(os.path.basename(json_file))[0]
 
-            master_id, layout_map, page_size = get_theme_and_layouts(slides_service, presentation_id)
-            if not master_id: raise Exception("Could not find target theme.")
-            
-            replace_master_slide_text(slides_service, presentation_id, master_id, globals_config)
+                globals_config['header'] = workshop_title
+                presentation_id = copies.get(json_file_base)
+                if not presentation_id: raise Exception("Failed to copy template.")
 
-            pres = slides_service.presentations().get(presentationId=presentation_id).execute()
-            if slide_ids := [s['objectId'] for s in pres.get('slides', [])]:
-                slides_service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": [{"deleteObject": {"objectId": sid}} for sid in slide_ids]}).execute()
-                logging.info(f"Removed {len(slide_ids)} template slides.")
+                master_id, layout_map, layout_placeholders, page_size = get_theme_and_layouts(slides_api, presentation_id)
+                if not master_id: raise Exception("Could not find target theme.")
+                # Keeps the offline preview renderer in step with the template.
+                save_layout_cache(TEMPLATE_ID, TARGET_THEME_NAME, layout_map, layout_placeholders, page_size)
 
-            if any(slide.get('layoutClass') == 'table_fullscreen' for slide in slides):
-                default_table_font_size = get_default_font_size(slides_service, presentation_id, layout_map, class_to_layout_name_map)
-            
-            json_file_base = os.path.splitext(os.path.basename(json_file))[0]
-            for i, slide_data in enumerate(slides):
-                slide_data['total_slides'], slide_data['json_file_base'] = len(slides), json_file_base
-                add_slide_to_presentation(slides_service, drive_service, s3_client, presentation_id, i, slide_data, layout_map, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size)
+                # Same field mask as the theme lookup, so the template slides are listed from the cache.
+                pres = slides_api.get_presentation(presentation_id, PRESENTATION_FIELDS, 'template.list_slides')
+                if slide_ids := [s['objectId'] for s in pres.get('slides', [])]:
+                    slides_api.batch_update(presentation_id, [{"deleteObject": {"objectId": sid}} for sid in slide_ids], 'template.delete_slides')
+                    logging.info(f"Removed {len(slide_ids)} template slides.")
 
-            logging.info(f"✅ Successfully created presentation: https://docs.google.com/presentation/d/{presentation_id}/")
-        except Exception as e:
-            logging.error(f"❌ An unexpected error occurred while processing {json_file}. Error: {e}", exc_info=True)
+                replace_master_slide_text(slides_api, presentation_id, master_id, globals_config)
+
+                if any(slide.get('layoutClass') == 'table_fullscreen' for slide in slides):
+                    default_table_font_size = get_default_font_size(slides_api, presentation_id, layout_map, class_to_layout_name_map)
+
+                build_slides(slides_api, s3_client, presentation_id, slides, json_file_base, layout_map, layout_placeholders, class_to_layout_name_map, placeholder_map, page_size, globals_config, default_table_font_size)
+
+                logging.info(f"✅ Successfully created presentation: https://docs.google.com/presentation/d/{presentation_id}/")
+                completed_ids.append(presentation_id)
+            except Exception as e:
+                logging.error(f"❌ An unexpected error occurred while processing {json_file}. Error: {e}", exc_info=True)
+                failed_files.append(json_file)
+
+    # Decks left unmarked are failed builds, trashed by 'drive_housekeeping.py cleanup'.
+    if completed_ids:
+        try: mark_complete(drive_service, completed_ids)
+        except HttpError as err: logging.warning(f"Could not mark the built presentations as complete: {err}")
 
     logging.info("\n--- Batch Processing Complete ---")
+    tracing.export(TRACE_FILE, METRICS_FILE, service_name="build-slides")
+    if args.profile:
+        tracing.log_profile_report()
+        slides_api.log_transfer_report()
+    if args.results:
+        with open(args.results, 'w', encoding='utf-8') as f:
+            json.dump([j for j in json_files if j not in failed_files], f)
+    # A non-zero exit lets the pipeline know these decks still need a rebuild.
+    if failed_files: sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+
+# --- Configuration ---
+# Where a deck's JSON and its Explain slides live, both named after the deck.
+DECK_SOURCE_DIRS = ["json_source", "explain_source"]
+
+# --- Patterns ---
+WHITESPACE = re.compile(r'\s*')
+# Citation tags left by NotebookLM/Gemini, e.g. "[cite_start]" or "[cite: 3, 12]".
+CITATION_TAG = re.compile(r'\[cite(?:_start|:[^\]\n]*)\]')
+# Outside strings, "+]" is a mangled citation tag in front of a key.
+STRAY_TAG = re.compile(rf'{CITATION_TAG.pattern}|\+\](?=\s*")')
+# Inside strings, "[cite_start]" opens a cited passage, so the whitespace before it
+# separates words (or a "- " bullet) and stays. A closing "[cite: n]" trails the
+# passage and goes together with the whitespace in front of it.
+STRING_CITATION = re.compile(r'\[cite_start\]|\s*\[cite:[^\]\n]*\]')
+OPENING_FENCE = re.compile(r'\s*```[A-Za-z]*[ \t]*\n')
+CLOSING_FENCE = re.compile(r'\n\s*```\s*$')
+LITERALS = {'true': True, 'false': False, 'null': None}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class _Parser:
+    """
+    Single-pass recursive-descent JSON parser that tolerates what LLMs add to JSON:
+    Markdown code fences, citation tags between tokens or inside strings, trailing
+    commas and raw control characters in strings. Strings are scanned with the
+    standard library's C scanner; a typical deck parses in a few milliseconds.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.repairs = []
+        self.start, self.end = 0, len(text)
+        if m := OPENING_FENCE.match(text):
+            self.start = m.end()
+            self.repair(0, "removed opening Markdown code fence")
+        if m := CLOSING_FENCE.search(text, self.start):
+            self.end = m.start()
+            self.repair(m.start() + 1, "removed closing Markdown code fence")
+
+    def repair(self, pos, message):
+        self.repairs.append((pos, message))
+
+    def located_repairs(self):
+        """Turns the recorded offsets into line and column numbers, in one pass over the text."""
+        newlines = [m.start() for m in re.finditer('\n', self.text)] if self.repairs else []
+        located = []
+        for pos, message in sorted(self.repairs, key=lambda r: r[0]):
+            line = bisect_left(newlines, pos)
+            located.append({'line': line + 1, 'column': pos - (newlines[line - 1] if line else -1), 'message': message})
+        return located
+
+    def error(self, message, pos):
+        raise json.JSONDecodeError(message, self.text, pos)
+
+    def skip(self, pos):
+        """Skips whitespace and any stray citation tags between tokens."""
+        while True:
+            pos = WHITESPACE.match(self.text, pos, self.end).end()
+            if not (m := STRAY_TAG.match(self.text, pos, self.end)):
+                return pos
+            self.repair(pos, f"removed misplaced citation tag '{m.group(0)}'")
+            pos = m.end()
+
+    def parse(self):
+        value, pos = self.value(self.skip(self.start))
+        if (pos := self.skip(pos)) < self.end:
+            self.error("Extra data", pos)
+        return value
+
+    def string(self, pos, is_key=False):
+        value, end = scanstring(self.text, pos + 1, False)
+        if '\n' in self.text[pos:end] and not is_key:
+            self.repair(pos, "kept raw line break inside a string")
+        if not is_key and '[cite' in value:
+            value, count = STRING_CITATION.subn('', value)
+            if count:
+                self.repair(pos, f"stripped {count} citation tag(s) from a string")
+        return value, end
+
+    def value(self, pos):
+        if pos >= self.end:
+            self.error("Expecting value", pos)
+        char = self.text[pos]
+        if char == '"':
+            return self.string(pos)
+        if char == '{':
+            return self.object(pos + 1)
+        if char == '[':
+            return self.array(pos + 1)
+        for literal, value in LITERALS.items():
+            if self.text.startswith(literal, pos):
+                return value, pos + len(literal)
+        if m := NUMBER_RE.match(self.text, pos, self.end):
+            integer, fraction, exponent = m.groups()
+            if fraction or exponent:
+                return float(integer + (fraction or '') + (exponent or '')), m.end()
+            return int(integer), m.end()
+        self.error("Expecting value", pos)
+
+    def object(self, pos):
+        result = {}
+        pos = self.skip(pos)
+        if pos < self.end and self.text[pos] == '}':
+            return result, pos + 1
+        while True:
+            if pos >= self.end or self.text[pos] != '"':
+                self.error("Expecting property name enclosed in double quotes", pos)
+            key, pos = self.string(pos, is_key=True)
+            pos = self.skip(pos)
+            if pos >= self.end or self.text[pos] != ':':
+                self.error("Expecting ':' delimiter", pos)
+            result[key], pos = self.value(self.skip(pos + 1))
+            pos = self.skip(pos)
+            if pos < self.end and self.text[pos] == '}':
+                return result, pos + 1
+            if pos >= self.end or self.text[pos] != ',':
+                self.error("Expecting ',' delimiter", pos)
+            comma, pos = pos, self.skip(pos + 1)
+            if pos < self.end and self.text[pos] == '}':
+                self.repair(comma, "removed trailing comma")
+                return result, pos + 1
+
+    def array(self, pos):
+        result = []
+        pos = self.skip(pos)
+        if pos < self.end and self.text[pos] == ']':
+            return result, pos + 1
+        while True:
+            item, pos = self.value(pos)
+            result.append(item)
+            pos = self.skip(pos)
+            if pos < self.end and self.text[pos] == ']':
+                return result, pos + 1
+            if pos >= self.end or self.text[pos] != ',':
+                self.error("Expecting ',' delimiter", pos)
+            comma, pos = pos, self.skip(pos + 1)
+            if pos < self.end and self.text[pos] == ']':
+                self.repair(comma, "removed trailing comma")
+                return result, pos + 1
+
+
+def parse_deck(text):
+    """
+    Parses LLM-produced deck JSON, repairing it and stripping citation tags on the way.
+    Returns (data, repairs), each repair a {'line', 'column', 'message'} dict.
+    Raises json.JSONDecodeError (with its position) if the text cannot be repaired.
+    """
+    parser = _Parser(text)
+    return parser.parse(), parser.located_repairs()
+
+
+def load_deck_with_repairs(file_path):
+    """
+    Reads and parses a deck file once per process, never modifying it. Later calls
+    for an unchanged file return the same cleaned data and repairs from memory.
+    """
+    stat = os.stat(file_path)
+    key, version = os.path.abspath(file_path), (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        if (cached := _cache.get(key)) and cached[0] == version:
+            return cached[1], cached[2]
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data, repairs = parse_deck(f.read())
+    if repairs:
+        file_name = os.path.basename(file_path)
+        # Citations inside strings are routine, so they are summed up rather than listed.
+        stripped = 0
+        for r in repairs:
+            if r['message'].startswith('stripped'):
+                stripped += 1
+            else:
+                logging.info(f"  - Repaired {file_name}:{r['line']}:{r['column']}: {r['message']}")
+        if stripped:
+            logging.info(f"  - Stripped citation tags from {stripped} string(s) in {file_name}.")
+    with _cache_lock:
+        _cache[key] = (version, data, repairs)
+    return data, repairs
+
+
+def load_deck(file_path):
+    """Returns the cleaned data of a deck file. See load_deck_with_repairs()."""
+    return load_deck_with_repairs(file_path)[0]
+
+
+def deck_ad_prefixes(deck):
+    """Returns the AD prefixes (e.g. 'OCP-NET') used by a deck or its Explain slides."""
+    prefixes = set()
+    for source_dir in DECK_SOURCE_DIRS:
+        try:
+            data = load_deck(os.path.join(source_dir, f"{deck}.json"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        prefixes |= {s['adId'].rsplit('-', 1)[0] for s in data.get('slides', []) if isinstance(s, dict) and isinstance(s.get('adId'), str)}
+    return prefixes
+
+
+def deck_matches(deck, selectors):
+    """
+    Tells whether a deck (its file base name) is picked by any of the selectors:
+    part of its name, in any case, or an AD prefix it uses, e.g. 'OCP-NET'.
+    No selectors pick every deck.
+    """
+    if not selectors or any(s.lower() in deck.lower() for s in selectors):
+        return True
+    prefixes = deck_ad_prefixes(deck)
+    return any(s.upper() in prefixes for s in selectors)
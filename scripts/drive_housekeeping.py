@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import glob
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import tracing
+from deck_json import deck_matches
+
+# --- Configuration ---
+JSON_SOURCE_DIR = "json_source"
+GENERATED_PREFIX = "Generated - "
+# Drive accepts at most 100 calls in one batch request.
+BATCH_LIMIT = 100
+# Calls rejected for rate limits or server errors are resent in new batches, with backoff.
+MAX_BATCH_RETRIES = 5
+BACKOFF_SECONDS = 1
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Incomplete builds younger than this may still be running (here or on another machine).
+DEFAULT_MIN_AGE_HOURS = 6
+# appProperties stamped on every generated presentation, so it can be found again.
+GENERATOR_NAME = "design-workshops"
+STATUS_BUILDING = "building"
+STATUS_COMPLETE = "complete"
+FILE_FIELDS = "id,name,createdTime,appProperties,webViewLink"
+
+
+# --- Batching ---
+def _is_retryable(error):
+    """Rate limits (429, or 403 userRateLimitExceeded/rateLimitExceeded) and server errors are worth resending."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status in RETRYABLE_STATUSES:
+        return True
+    content = getattr(error, 'content', b'') or b''
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    return status == 403 and 'ratelimitexceeded' in content.lower()
+
+
+def batch_execute(drive_service, requests):
+    """
+    Executes Drive requests through the batch endpoint, up to BATCH_LIMIT calls per
+    round trip. Calls that were rate-limited or hit a server error are resent in new
+    batches with exponential backoff. Returns a (response, error) tuple per request,
+    in request order.
+    """
+    results = [(None, None)] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    pending = list(range(len(requests)))
+    for attempt in range(MAX_BATCH_RETRIES + 1):
+        for start in range(0, len(pending), BATCH_LIMIT):
+            batch = drive_service.new_batch_http_request(callback=callback)
+            chunk = pending[start:start + BATCH_LIMIT]
+            for i in chunk:
+                batch.add(requests[i], request_id=str(i))
+            tracing.record_api_call(sum(len(requests[i].body or '') for i in chunk))
+            batch.execute()
+        pending = [i for i in pending if results[i][1] is not None and _is_retryable(results[i][1])]
+        if not pending or attempt == MAX_BATCH_RETRIES:
+            break
+        delay = BACKOFF_SECONDS * (2 ** attempt)
+        logging.warning(f"  - {len(pending)} Drive call(s) were rate-limited or hit a server error, retrying in {delay:.0f}s...")
+        tracing.record_retry()
+        time.sleep(delay)
+    return results
+
+
+def _log_failures(action, names, results):
+    failures = [(name, error) for name, (_, error) in zip(names, results) if error]
+    for name, error in failures:
+        logging.error(f"  - Failed to {action} '{name}'. Error: {error}")
+    return len(failures)
+
+
+# --- Template Copies ---
+@tracing.traced('template.copy')
+def copy_templates(drive_service, template_id, folder_id, decks):
+    """
+    Copies the template once per deck in batched requests. 'decks' maps each deck
+    name (the JSON file base) to its workshop title. Returns deck name -> new file ID
+    for every copy that succeeded.
+    """
+    generated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    names = list(decks)
+    requests = [drive_service.files().copy(fileId=template_id, supportsAllDrives=True, fields='id', body={
+        'name': f"{GENERATED_PREFIX}{decks[deck]}",
+        'parents': [folder_id],
+        'appProperties': {'generator': GENERATOR_NAME, 'deck': deck, 'status': STATUS_BUILDING, 'generatedAt': generated_at},
+    }) for deck in names]
+    results = batch_execute(drive_service, requests)
+    _log_failures("copy the template for", names, results)
+    return {deck: response['id'] for deck, (response, _) in zip(names, results) if response}
+
+
+def mark_complete(drive_service, file_ids):
+    """Flags presentations as fully built, so cleanup no longer treats them as orphans."""
+    requests = [drive_service.files().update(fileId=file_id, supportsAllDrives=True, fields='id',
+                                             body={'appProperties': {'status': STATUS_COMPLETE}}) for file_id in file_ids]
+    _log_failures("mark as complete", file_ids, batch_execute(drive_service, requests))
+
+
+# --- Listing and Cleanup ---
+def list_generated_files(drive_service, folder_id):
+    """Lists the non-trashed "Generated - ..." presentations in the output folder, newest first."""
+    query = f"'{folder_id}' in parents and trashed = false and name contains '{GENERATED_PREFIX}'"
+    files, page_token = [], None
+    while True:
+        tracing.record_api_call()
+        response = drive_service.files().list(
+            q=query, fields=f"nextPageToken,files({FILE_FIELDS})", orderBy="createdTime desc", pageSize=1000,
+            supportsAllDrives=True, includeItemsFromAllDrives=True, pageToken=page_token,
+        ).execute()
+        files.extend(f for f in response.get('files', []) if f.get('name', '').startswith(GENERATED_PREFIX))
+        if not (page_token := response.get('nextPageToken')):
+            return files
+
+
+def deck_key(file):
+    """Identifies which deck a generated file belongs to: its 'deck' appProperty, or its title for older files."""
+    return (file.get('appProperties') or {}).get('deck') or file['name'][len(GENERATED_PREFIX):]
+
+
+def file_age(file, now=None):
+    """How long ago a generated file was created: its 'generatedAt' appProperty, or Drive's createdTime."""
+    stamp = (file.get('appProperties') or {}).get('generatedAt') or file.get('createdTime')
+    if not stamp:
+        return None
+    created = datetime.fromisoformat(stamp.replace('Z', '+00:00'))
+    return (now or datetime.now(timezone.utc)) - created
+
+
+def select_stale_files(files, known_decks=None, keep=1, min_age=timedelta(hours=DEFAULT_MIN_AGE_HOURS), now=None):
+    """
+    Picks the files to trash from a newest-first listing:
+    - orphans: builds that never completed, and files of decks no longer in json_source,
+    - older generations: all but the 'keep' newest complete files of each deck.
+    Incomplete builds younger than 'min_age' are left alone: they may still be running.
+    Files created before appProperties were stamped only count as older generations.
+    Returns a list of (file, reason) tuples.
+    """
+    stale, kept = [], {}
+    for file in files:
+        properties = file.get('appProperties') or {}
+        deck = deck_key(file)
+        if properties.get('generator') == GENERATOR_NAME and properties.get('status') != STATUS_COMPLETE:
+            if (age := file_age(file, now)) is not None and age < min_age:
+                logging.info(f"  - Keeping '{file['name']}': its build started {age.total_seconds() / 3600:.1f}h ago and may still be running.")
+                continue
+            stale.append((file, "incomplete build"))
+        elif known_decks is not None and properties.get('deck') and deck not in known_decks:
+            stale.append((file, f"deck '{deck}' no longer exists"))
+        elif kept.get(deck, 0) >= keep:
+            stale.append((file, "older generation"))
+        else:
+            kept[deck] = kept.get(deck, 0) + 1
+    return stale
+
+
+def trash_files(drive_service, files):
+    """Moves files to the trash in batched requests (they stay recoverable from the Drive trash)."""
+    requests = [drive_service.files().update(fileId=f['id'], body={'trashed': True}, supportsAllDrives=True, fields='id') for f in files]
+    return len(files) - _log_failures("trash", [f['name'] for f in files], batch_execute(drive_service, requests))
+
+
+# --- Sharing ---
+def share_files(drive_service, files, emails=(), domain=None, role='reader', notify=False):
+    """Grants 'role' on every file to each email address and/or a whole domain, in batched requests."""
+    permissions = [{'type': 'user', 'role': role, 'emailAddress': email} for email in emails]
+    if domain:
+        permissions.append({'type': 'domain', 'role': role, 'domain': domain})
+    requests, names = [], []
+    for f in files:
+        for permission in permissions:
+            requests.append(drive_service.permissions().create(fileId=f['id'], body=permission, supportsAllDrives=True,
+                                                               sendNotificationEmail=notify if permission['type'] == 'user' else None, fields='id'))
+            names.append(f"{f['name']} ({permission.get('emailAddress') or permission.get('domain')})")
+    return len(requests) - _log_failures("share", names, batch_execute(drive_service, requests))
+
+
+def latest_per_deck(files, selectors=()):
+    """Returns the newest complete file of each deck, optionally only for the decks the selectors pick (see deck_matches)."""
+    latest = {}
+    for file in files:
+        properties = file.get('appProperties') or {}
+        if properties.get('generator') == GENERATOR_NAME and properties.get('status') != STATUS_COMPLETE:
+            continue
+        deck = deck_key(file)
+        if deck not in latest and deck_matches(deck, selectors):
+            latest[deck] = file
+    return list(latest.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Housekeeping for the generated presentations in the Drive output folder.")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    cleanup = subparsers.add_parser('cleanup', help="Trash incomplete builds, decks that no longer exist and older generations.")
+    cleanup.add_argument('--keep', type=int, default=1, help="Complete generations to keep per deck (default: 1).")
+    cleanup.add_argument('--min-age', type=float, default=DEFAULT_MIN_AGE_HOURS,
+                         help=f"Hours before an incomplete build counts as failed (default: {DEFAULT_MIN_AGE_HOURS}).")
+    cleanup.add_argument('--dry-run', action='store_true', help="List what would be trashed without trashing it.")
+    share = subparsers.add_parser('share', help="Share the latest presentation of each deck (or of the selected decks).")
+    share.add_argument('selectors', nargs='*', help="Deck file names (or part of them) or AD prefixes, e.g. 'OCP-NET', as for the pipeline. Defaults to every deck.")
+    share.add_argument('--user', action='append', default=[], help="Email address to share with (repeatable).")
+    share.add_argument('--domain', help="Share with everyone in this domain.")
+    share.add_argument('--role', default='reader', choices=['reader', 'commenter', 'writer'])
+    share.add_argument('--notify', action='store_true', help="Send a notification email to the users.")
+    args = parser.parse_args()
+    if args.action == 'share' and not args.user and not args.domain:
+        parser.error("share needs --user and/or --domain")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    # Imported here: the builder reads and checks its .env configuration on import.
+    from build_slides_from_json import authenticate_google, OUTPUT_FOLDER_ID
+
+    _, drive_service = authenticate_google()
+    if not drive_service: sys.exit(1)
+    files = list_generated_files(drive_service, OUTPUT_FOLDER_ID)
+    logging.info(f"Found {len(files)} generated presentation(s) in the output folder.")
+
+    if args.action == 'cleanup':
+        known_decks = {os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(JSON_SOURCE_DIR, '*.json'))}
+        stale = select_stale_files(files, known_decks, keep=args.keep, min_age=timedelta(hours=args.min_age))
+        for file, reason in stale:
+            logging.info(f"  - {'Would trash' if args.dry_run else 'Trashing'} '{file['name']}' ({file.get('createdTime', '?')}): {reason}")
+        if stale and not args.dry_run:
+            logging.info(f"✅ Trashed {trash_files(drive_service, [f for f, _ in stale])} of {len(stale)} presentation(s).")
+        elif not stale:
+            logging.info("✅ Nothing to clean up.")
+    else:
+        selected = latest_per_deck(files, args.selectors)
+        granted = share_files(drive_service, selected, args.user, args.domain, args.role, args.notify)
+        logging.info(f"✅ Granted {granted} permission(s) on {len(selected)} presentation(s).")
+        for file in selected:
+            logging.info(f"  - {file['name']}: {file.get('webViewLink', '')}")
+
+
+if __name__ == "__main__":
+    main()
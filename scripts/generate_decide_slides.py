@@ -0,0 +1,215 @@
+import os
+import sys
+import logging
+import json
+import re
+import argparse
+
+from workshop_sources import load_ad_repository, load_agenda, find_session
+from deck_json import load_deck
+from validate_decks import validate_deck, load_reference_data
+
+# --- Configuration ---
+JSON_SOURCE_DIR = "json_source"
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[
+        logging.FileHandler("generation.log", mode='a'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+
+# The full AD block in the Decide speaker notes, in this EXACT order: (notes label, repository label).
+NOTES_FIELDS = [
+    ('Question', 'Architectural Question'),
+    ('Issue', 'Issue or Problem'),
+    ('Assumptions', 'Assumption'),
+    ('Alternatives', 'Alternatives'),
+    ('Justification', 'Justification'),
+    ('Implications', 'Implications'),
+    ('Agreeing Parties', 'Agreeing Parties'),
+]
+
+# Layout classes that bracket the generated content rather than belonging to a topic.
+OPENING_CLASSES = ['title']
+CLOSING_CLASSES = ['closing']
+
+
+def slugify(text):
+    """Turns a workshop title into a file name friendly slug."""
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def content_items(lines):
+    """Returns the non-blank lines of an AD section, verbatim."""
+    return [line for line in lines if line.strip()]
+
+
+def with_blank_lines(items):
+    """Interleaves a blank line between every item."""
+    spaced = []
+    for item in items:
+        if spaced:
+            spaced.append("")
+        spaced.append(item)
+    return spaced
+
+
+def build_agenda_slide(session):
+    """Builds the Agenda slide listing only the topics of the given session, in agenda order."""
+    body = []
+    for topic in session['topics']:
+        if topic['adId']:
+            body.append(f"- **{topic['adId']}**: {topic['title']}")
+        else:
+            body.append(f"- {topic['title']}")
+    return {"layoutClass": "agenda", "title": "Agenda", "body": body}
+
+
+def build_decide_slide(ad, workshop_context=None):
+    """
+    Builds a Decide slide for an AD. The visible body holds only the ID, Title,
+    Question and Alternatives; the speaker notes hold the full AD, copied verbatim.
+    """
+    sections = ad['sections']
+    question = " ".join(content_items(sections.get('Architectural Question', [])))
+    alternatives = content_items(sections.get('Alternatives', []))
+
+    body = with_blank_lines([
+        f"**ID:** {ad['id']}",
+        f"**Title:** {ad['title']}",
+        f"**Question:** {question}",
+        "**Alternatives:**",
+    ] + alternatives)
+
+    notes = ["", "**ID**", "", ad['id'], "", "**Title**", "", ad['title']]
+    for notes_label, repository_label in NOTES_FIELDS:
+        items = content_items(sections.get(repository_label, []))
+        if not items and notes_label == 'Assumptions':
+            items = ["N/A"]
+        notes.extend(["", f"**{notes_label}**", ""] + with_blank_lines(items))
+    if workshop_context:
+        notes.extend(["", "**Workshop Context**", "", workshop_context.strip()])
+
+    return {
+        "layoutClass": "default",
+        "adId": ad['id'],
+        "title": f"Decide: {ad['title']}",
+        "body": body,
+        "speakerNotes": "\n".join(notes),
+    }
+
+
+def merge_explain_slides(session, decide_slides, explain_slides):
+    """
+    Merges the model-written Explain slides with the generated slides. Explain
+    slides carry an 'adId' and are placed right before that AD's Decide slide,
+    following the agenda order. Title slides open the deck, closing slides end it,
+    and Explain slides without an 'adId' (free-form agenda items) go after the last
+    AD topic. Returns the slides and the Explain slides whose 'adId' has no Decide
+    slide in this session, which are left out.
+    """
+    by_ad = {}
+    opening, closing, unassigned, unplaced = [], [], [], []
+    for slide in explain_slides:
+        if slide.get('layoutClass') in OPENING_CLASSES:
+            opening.append(slide)
+        elif slide.get('layoutClass') in CLOSING_CLASSES:
+            closing.append(slide)
+        elif (ad_id := slide.get('adId')) in decide_slides:
+            by_ad.setdefault(ad_id, []).append(slide)
+        elif ad_id:
+            unplaced.append(slide)
+        else:
+            unassigned.append(slide)
+
+    slides = opening + [build_agenda_slide(session)]
+    for topic in session['topics']:
+        if (ad_id := topic['adId']) in decide_slides:
+            slides.extend(by_ad.get(ad_id, []))
+            slides.append(decide_slides[ad_id])
+    return slides + unassigned + closing, unplaced
+
+
+def generate_deck(session, ads, explain_data=None):
+    """
+    Generates the deck JSON for one agenda session, optionally merged with Explain slides.
+    Returns the deck and its problems: the same agenda and AD repository mismatches
+    that validate_decks.py rejects, so a deck that would fail validation is never written.
+    """
+    explain_slides = (explain_data or {}).get('slides', [])
+    contexts = {s['adId']: s['workshopContext'] for s in explain_slides if s.get('adId') and s.get('workshopContext')}
+
+    decide_slides, problems = {}, []
+    for topic in session['topics']:
+        ad_id = topic['adId']
+        if not ad_id:
+            continue
+        if ad_id not in ads:
+            problems.append(f"AD '{ad_id}' is on the agenda but missing from the AD repository")
+            continue
+        decide_slides[ad_id] = build_decide_slide(ads[ad_id], contexts.get(ad_id))
+
+    slides, unplaced = merge_explain_slides(session, decide_slides, explain_slides)
+    for slide in unplaced:
+        where = "in the AD repository" if slide['adId'] not in ads else f"on the agenda of '{session['workshopTopic']}'"
+        problems.append(f"Explain slide '{slide.get('title', '')}' references AD '{slide['adId']}', which is not {where}")
+    logging.info(f"  - Generated {len(decide_slides)} Decide slide(s) and merged {len(explain_slides) - len(unplaced)} Explain slide(s).")
+    return {"workshopTitle": session['workshopTopic'], "slides": slides}, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates the Agenda and Decide slides of a workshop deck straight from agenda.md and the AD repository.")
+    parser.add_argument('workshop', nargs='?', help="Workshop topic as written in agenda.md, e.g. 'Day 2: Networking Deep Dive'.")
+    parser.add_argument('--explain', help="JSON file with the model-written Explain slides to merge in.")
+    parser.add_argument('--output', help=f"Output deck JSON file. Defaults to '{JSON_SOURCE_DIR}/<workshop-slug>.json'.")
+    parser.add_argument('--list', action='store_true', help="Lists the workshop topics found in agenda.md.")
+    args = parser.parse_args()
+
+    if not args.workshop and (args.explain or args.output):
+        parser.error("a workshop topic is required with --explain or --output")
+
+    sessions = load_agenda()
+    if args.list or not args.workshop:
+        for session in sessions:
+            print(f"{session['workshopTopic']} ({sum(1 for t in session['topics'] if t['adId'])} ADs)")
+        return
+
+    session = find_session(sessions, args.workshop)
+    if not session:
+        logging.critical(f"FATAL: Workshop topic '{args.workshop}' not found in agenda.md. Use --list to see available topics.")
+        sys.exit(1)
+
+    explain_data = None
+    if args.explain:
+        try:
+            explain_data = load_deck(args.explain)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.critical(f"FATAL: Could not read Explain slides from '{args.explain}'. Error: {e}")
+            sys.exit(1)
+
+    logging.info(f"--- Generating deck for '{session['workshopTopic']}' ---")
+    deck, problems = generate_deck(session, load_ad_repository(), explain_data)
+    output_path = args.output or os.path.join(JSON_SOURCE_DIR, f"{slugify(session['workshopTopic'])}.json")
+    # The same checks extract-images and build-slides run first; images do not exist yet.
+    try:
+        problems += validate_deck(deck, os.path.basename(output_path), load_reference_data(), check_images=False)
+    except OSError as e:
+        logging.critical(f"FATAL: Could not load validation reference data. Error: {e}")
+        sys.exit(1)
+    if problems:
+        for problem in problems:
+            logging.error(f"  - {problem}")
+        logging.critical("FATAL: The deck would not pass validation. Fix the Explain slides, agenda.md or the AD repository. No deck written.")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(deck, f, indent=2, ensure_ascii=False)
+    logging.info(f"✅ Wrote {len(deck['slides'])} slides to '{output_path}'.")
+
+
+if __name__ == "__main__":
+    main()
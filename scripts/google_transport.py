@@ -0,0 +1,86 @@
+import time
+import logging
+import threading
+import httplib2
+import urllib3
+from urllib3.exceptions import ProtocolError, NewConnectionError, ConnectTimeoutError
+import google.auth.transport.urllib3
+
+import tracing
+
+# --- Configuration ---
+POOL_SIZE = 10
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 0.5
+
+# Failures where the connection could not be opened, so the request never reached the API.
+CONNECT_ERRORS = (NewConnectionError, ConnectTimeoutError)
+# A connection dropped under a request (e.g. "Connection reset by peer") may have
+# dropped it after the API acted on it, so only idempotent requests are sent again.
+RETRYABLE_ERRORS = CONNECT_ERRORS + (ProtocolError,)
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+
+class PooledHttp:
+    """
+    httplib2.Http-compatible transport for googleapiclient services, backed by a
+    thread-safe urllib3 pool of persistent connections. One instance can be shared
+    by every service and thread: tokens are refreshed once under a lock, and
+    failed connections are retried with exponential backoff. A POST, such as a
+    batchUpdate, is only retried when its connection could not be opened.
+    """
+    def __init__(self, credentials, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES):
+        self._credentials = credentials
+        self._refresh_lock = threading.Lock()
+        self.max_retries = max_retries
+        # block=True makes extra threads wait for a free connection instead of opening throwaway ones.
+        self.pool = urllib3.PoolManager(
+            num_pools=4, maxsize=pool_size, block=True, retries=False,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        )
+        self._auth_request = google.auth.transport.urllib3.Request(self.pool)
+
+    def _apply_credentials(self, headers, stale_token=None):
+        """Adds the bearer token, refreshing it first if it expired or was rejected. Only one thread refreshes."""
+        with self._refresh_lock:
+            if not self._credentials.valid or (stale_token and self._credentials.token == stale_token):
+                logging.info("Refreshing Google API access token.")
+                self._credentials.refresh(self._auth_request)
+            self._credentials.apply(headers)
+            return self._credentials.token
+
+    def _send(self, method, uri, body, headers, redirections):
+        retryable = RETRYABLE_ERRORS if method.upper() in IDEMPOTENT_METHODS else CONNECT_ERRORS
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.pool.request(method, uri, body=body, headers=headers, redirect=redirections > 0, preload_content=True)
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = BACKOFF_SECONDS * (2 ** attempt)
+                logging.warning(f"  - Connection error on {method} {uri.split('?')[0]} ({e.__class__.__name__}), retrying in {delay:.1f}s...")
+                tracing.record_retry()
+                time.sleep(delay)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        """Same signature and return value as httplib2.Http.request: (response, content)."""
+        headers = dict(headers or {})
+        token = self._apply_credentials(headers)
+        response = self._send(method, uri, body, headers, redirections)
+        if response.status == 401:
+            # Another thread may already have refreshed; otherwise refresh now and resend once.
+            self._apply_credentials(headers, stale_token=token)
+            response = self._send(method, uri, body, headers, redirections)
+
+        info = {key.lower(): value for key, value in response.headers.items()}
+        # urllib3 has already decoded the body.
+        info.pop('content-encoding', None)
+        info['status'] = str(response.status)
+        http_response = httplib2.Response(info)
+        http_response.reason = response.reason
+        return http_response, response.data
+
+    def close(self):
+        self.pool.clear()
@@ -0,0 +1,348 @@
+import os
+import sys
+import logging
+import json
+import glob
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from deck_json import load_deck, deck_matches
+
+# --- Configuration ---
+STATE_FILE = ".pipeline_state.json"
+DOC_CONFIG_FILE = "doc_downloader/download_config.yaml"
+DOCS_DIR = "docs"
+KB_DIR = "knowledge_base"
+PROMPTS_DIR = "generated_prompts"
+EXPLAIN_SOURCE_DIR = "explain_source"
+JSON_SOURCE_DIR = "json_source"
+SOURCE_DOCS_DIR = "source_documents"
+IMAGE_DIRECTORY = "extracted_images"
+AD_REPOSITORY_DIR = "ad_repository"
+AGENDA_FILE = "agenda.md"
+LAYOUTS_FILE = "layouts.yaml"
+DEFAULT_JOBS = 4
+# One builder process takes every stale deck: it shares one login, layout cache,
+# trace and batched template copy between them.
+BUILDER_COMMAND = [sys.executable, 'scripts/build_slides_from_json.py']
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] - %(message)s",
+    handlers=[
+        logging.FileHandler("pipeline.log", mode='a'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+
+# Maps the run.sh commands to the pipeline stage they select.
+STAGES = {
+    'download-docs': 'docs',
+    'prepare-kb': 'kb',
+    'generate-prompt': 'prompts',
+    'generate-deck': 'json',
+    'extract-images': 'images',
+    'build-slides': 'decks',
+    'all': None,
+}
+
+
+# --- Content Fingerprints ---
+class FingerprintCache:
+    """
+    Hashes file contents, reusing the previous run's hash while a file's size
+    and mtime are unchanged so large PDFs are not re-read on every run.
+    """
+    def __init__(self, known_files):
+        self.known = known_files
+        self.files = {}
+
+    def file_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = [stat.st_size, stat.st_mtime_ns]
+        if (entry := self.known.get(path)) and entry[:2] == key:
+            self.files[path] = entry
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        self.files[path] = key + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, target):
+        """Fingerprints a target from its command and the content of all its inputs."""
+        digest = hashlib.sha256(json.dumps(target['command']).encode('utf-8'))
+        for path in sorted(set(target['inputs']())):
+            digest.update(f"{path}\0{self.file_hash(path)}\0".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def load_state():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'targets': {}, 'files': {}}
+
+
+def save_state(state):
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+# --- Dependency Graph ---
+def _files(pattern):
+    return sorted(glob.glob(pattern))
+
+
+def _deck_image_sources(json_file):
+    """Returns the source PDFs referenced by a deck, so editing a PDF invalidates its extraction."""
+    try:
+        data = load_deck(json_file)
+    except (OSError, json.JSONDecodeError):
+        return []
+    sources = {s['imageReference'].get('sourceFile') for s in data.get('slides', []) if isinstance(s.get('imageReference'), dict)}
+    return [os.path.join(SOURCE_DOCS_DIR, s) for s in sources if s]
+
+
+def make_target(name, stage, command, inputs, outputs=lambda: [], deps=(), deck=None, batch=None):
+    """
+    'batch' is a command prefix shared with other targets: the stale ones then run as
+    a single command, the prefix followed by each target's own arguments.
+    """
+    return {'name': name, 'stage': stage, 'command': command, 'inputs': inputs, 'outputs': outputs, 'deps': list(deps), 'deck': deck, 'batch': batch}
+
+
+def build_graph(extra_args):
+    """
+    Builds the pipeline graph: docs -> KB -> prompts, and for each deck
+    JSON -> images -> decks. The deck chains read the Explain slides, agenda.md,
+    the AD repository and source_documents/, not the downloaded docs, so a failed
+    download does not hold them back. Stages whose script is not in this checkout
+    are left out.
+    """
+    targets = {}
+
+    def add(target):
+        targets[target['name']] = target
+        return target['name']
+
+    docs = add(make_target('docs', 'docs', ['./doc_downloader/download_all_docs.sh'] + extra_args.get('docs', []),
+                           inputs=lambda: [DOC_CONFIG_FILE], outputs=lambda: _files(os.path.join(DOCS_DIR, '*.pdf'))))
+    upstream = [docs]
+
+    if os.path.exists('scripts/prepare_kb.py'):
+        upstream = [add(make_target('kb', 'kb', [sys.executable, 'scripts/prepare_kb.py'],
+                                    inputs=lambda: _files(os.path.join(DOCS_DIR, '*.pdf')), outputs=lambda: _files(os.path.join(KB_DIR, '*')), deps=upstream))]
+    if os.path.exists('scripts/generate_prompt.py'):
+        upstream = [add(make_target('prompts', 'prompts', [sys.executable, 'scripts/generate_prompt.py'],
+                                    inputs=lambda: _files(os.path.join(KB_DIR, '*')) + [AGENDA_FILE], outputs=lambda: _files(os.path.join(PROMPTS_DIR, '*')), deps=upstream))]
+
+    # Explain slides come back from the model by hand, so each one starts its own deck chain
+    # instead of depending on the prompts.
+    explain_decks = {}
+    for explain_file in _files(os.path.join(EXPLAIN_SOURCE_DIR, '*.json')):
+        base = os.path.splitext(os.path.basename(explain_file))[0]
+        try:
+            workshop_title = load_deck(explain_file).get('workshopTitle')
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Skipping unreadable Explain slides '{explain_file}'. Error: {e}")
+            continue
+        if not isinstance(workshop_title, str) or not workshop_title.strip():
+            logging.warning(f"Skipping Explain slides '{explain_file}': no 'workshopTitle' to find its session in {AGENDA_FILE}.")
+            continue
+        json_file = os.path.join(JSON_SOURCE_DIR, f"{base}.json")
+        explain_decks[base] = add(make_target(
+            f"json:{base}", 'json',
+            [sys.executable, 'scripts/generate_decide_slides.py', workshop_title, '--explain', explain_file, '--output', json_file],
+            inputs=lambda f=explain_file: [f, AGENDA_FILE] + _files(os.path.join(AD_REPOSITORY_DIR, '*.md')),
+            outputs=lambda j=json_file: [j], deck=base))
+
+    deck_bases = {os.path.splitext(os.path.basename(f))[0] for f in _files(os.path.join(JSON_SOURCE_DIR, '*.json'))} | set(explain_decks)
+    for base in sorted(deck_bases):
+        json_file = os.path.join(JSON_SOURCE_DIR, f"{base}.json")
+        json_deps = [explain_decks[base]] if base in explain_decks else []
+        images = add(make_target(
+            f"images:{base}", 'images', [sys.executable, 'scripts/extract_images.py', json_file],
+            inputs=lambda j=json_file: [j] + _deck_image_sources(j),
+            outputs=lambda b=base: _files(os.path.join(IMAGE_DIRECTORY, f"{b}-slide_*")), deps=json_deps, deck=base))
+        add(make_target(
+            f"decks:{base}", 'decks', BUILDER_COMMAND + [json_file],
+            inputs=lambda j=json_file, b=base: [j, LAYOUTS_FILE] + _files(os.path.join(IMAGE_DIRECTORY, f"{b}-slide_*")),
+            deps=[images], deck=base, batch=BUILDER_COMMAND))
+    return targets
+
+
+def select_targets(targets, stage, selectors):
+    """
+    Selects the requested targets and everything they depend on. A selector
+    matches a deck by file name or by an AD prefix it uses, e.g. 'OCP-NET'.
+    """
+    def matches(target):
+        if stage and target['stage'] != stage:
+            return False
+        if not selectors:
+            return True
+        return bool(target['deck']) and deck_matches(target['deck'], selectors)
+
+    selected, pending = set(), [name for name, t in targets.items() if matches(t)]
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(targets[name]['deps'])
+    return selected
+
+
+# --- Execution ---
+def topological_order(targets, selected):
+    order, visited = [], set()
+
+    def visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        for dep in targets[name]['deps']:
+            if dep in selected:
+                visit(dep)
+        order.append(name)
+
+    for name in sorted(selected):
+        visit(name)
+    return order
+
+
+def is_stale(target, state, cache):
+    """A target is stale when its command or input contents changed, or a recorded output is gone."""
+    recorded = state['targets'].get(target['name'])
+    if not recorded or recorded.get('fingerprint') != cache.fingerprint(target):
+        return True
+    return any(not os.path.exists(p) for p in recorded.get('outputs', []))
+
+
+def run_targets(batch_targets):
+    """
+    Runs one target, or several targets sharing a batch prefix as one command, and
+    returns the names of those that succeeded. A batch command is given
+    '--results FILE' and lists there the arguments it completed, so one failed
+    deck does not fail the others built with it.
+    """
+    prefix = batch_targets[0]['batch']
+    if not prefix:
+        target = batch_targets[0]
+        logging.info(f"▶️  Running {target['name']}: {' '.join(target['command'])}")
+        return [target['name']] if subprocess.run(target['command']).returncode == 0 else []
+
+    fd, results_file = tempfile.mkstemp(prefix='pipeline_results-', suffix='.json')
+    os.close(fd)
+    try:
+        command = prefix + ['--results', results_file] + [arg for t in batch_targets for arg in t['command'][len(prefix):]]
+        logging.info(f"▶️  Running {', '.join(t['name'] for t in batch_targets)}: {' '.join(command)}")
+        subprocess.run(command)
+        try:
+            with open(results_file, 'r', encoding='utf-8') as f: completed = set(json.load(f))
+        except json.JSONDecodeError:
+            # Left empty: the command stopped before building anything.
+            completed = set()
+        return [t['name'] for t in batch_targets if set(t['command'][len(prefix):]) <= completed]
+    finally:
+        os.remove(results_file)
+
+
+def run_pipeline(targets, selected, state, force=False, dry_run=False, jobs=DEFAULT_JOBS):
+    """
+    Runs the selected targets in dependency order, independent ones in parallel.
+    Staleness is checked once a target's dependencies are done, so upstream
+    changes propagate through the content of the files they produce; a failed
+    target skips everything downstream of it. Stale targets of a batch wait until
+    no other target of that batch is pending, then run together.
+    """
+    cache = FingerprintCache(state.get('files', {}))
+    done, ran, failed = set(), set(), set()
+    remaining = set(selected)
+    running, batches = {}, {}
+    order = topological_order(targets, selected)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while remaining or running:
+            # Topological order lets a whole chain of up-to-date targets settle in one pass.
+            for name in [n for n in order if n in remaining]:
+                target = targets[name]
+                deps = [d for d in target['deps'] if d in selected]
+                if any(d in failed for d in deps):
+                    logging.error(f"⏭️  Skipping {name}: a dependency failed.")
+                    failed.add(name); remaining.discard(name)
+                elif all(d in done for d in deps):
+                    remaining.discard(name)
+                    if not (force or is_stale(target, state, cache)):
+                        logging.info(f"✅ {name} is up to date.")
+                        done.add(name)
+                    elif dry_run:
+                        logging.info(f"🔎 Would run {name} (targets downstream may follow once it has).")
+                        done.add(name); ran.add(name)
+                    elif target['batch']:
+                        batches.setdefault(tuple(target['batch']), []).append(name)
+                    else:
+                        running[executor.submit(run_targets, [target])] = [name]
+
+            for key, names in list(batches.items()):
+                if not any(tuple(targets[n]['batch'] or ()) == key for n in remaining):
+                    running[executor.submit(run_targets, [targets[n] for n in sorted(names)])] = sorted(names)
+                    del batches[key]
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                names = running.pop(future)
+                succeeded = future.result()
+                if failures := [n for n in names if n not in succeeded]:
+                    logging.error(f"❌ {', '.join(failures)} failed.")
+                    failed.update(failures)
+                if not succeeded:
+                    continue
+                for name in succeeded:
+                    target = targets[name]
+                    # Fingerprint after the run: some stages rewrite their own inputs.
+                    state['targets'][name] = {'fingerprint': cache.fingerprint(target), 'outputs': target['outputs']()}
+                    done.add(name); ran.add(name)
+                state['files'] = {**state.get('files', {}), **cache.files}
+                save_state(state)
+
+    logging.info(f"--- Pipeline finished: {len(ran)} ran, {len(done) - len(ran)} up to date, {len(failed)} failed ---")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the presentation pipeline incrementally, rebuilding only stale targets.")
+    parser.add_argument('stage', nargs='?', default='all', choices=list(STAGES), help="Pipeline stage to bring up to date, with everything it depends on.")
+    parser.add_argument('selectors', nargs='*', help="Deck file names or AD prefixes to restrict the run to, e.g. 'OCP-NET'.")
+    parser.add_argument('--force', action='store_true', help="Run the selected targets even if they are up to date.")
+    parser.add_argument('--no-cache', action='store_true', help="Re-download all documents (implies --force for the docs stage).")
+    parser.add_argument('--cleanup', action='store_true', help="Delete orphan documents after downloading (docs stage).")
+    parser.add_argument('--dry-run', action='store_true', help="Only show what would run.")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help=f"Maximum targets run in parallel (default {DEFAULT_JOBS}).")
+    args = parser.parse_args()
+
+    extra_args = {'docs': (['--no-cache'] if args.no_cache else []) + (['--cleanup'] if args.cleanup else [])}
+    targets = build_graph(extra_args)
+    selected = select_targets(targets, STAGES[args.stage], args.selectors)
+    if not selected:
+        logging.warning(f"No targets match '{args.stage}' {' '.join(args.selectors)}. Nothing to do.")
+        return
+
+    state = load_state()
+    if args.no_cache:
+        state['targets'].pop('docs', None)
+    if not run_pipeline(targets, selected, state, force=args.force, dry_run=args.dry_run, jobs=args.jobs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import re
+import sys
+import glob
+import html
+import time
+import logging
+import argparse
+import yaml
+import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
+
+from deck_json import load_deck
+from slide_layout import (LAYOUT_CACHE_FILE, estimate_table_font_size, get_table_area, get_placeholder_bounds,
+                          get_image_aspect_ratio, get_image_placement, get_text_assignments, load_layout_cache)
+
+# --- Configuration ---
+JSON_SOURCE_DIR = "json_source"
+IMAGE_DIRECTORY = "extracted_images"
+LAYOUTS_FILE = "layouts.yaml"
+PREVIEW_DIR = "previews"
+EMU_PER_PT = 12700
+# The template's placeholder fonts are not part of the cached geometry; these approximate them.
+FONT_SIZES = {'title': 24, 'subtitle': 16, 'header': 9, 'footer': 9, 'body': 14}
+DEFAULT_TABLE_FONT_PT = 12
+PLACEHOLDER_TYPES = ['TITLE', 'SUBTITLE', 'BODY', 'PICTURE', 'FOOTER']
+OUTLINE_COLOR = (0.8, 0.8, 0.8)
+OVERFLOW_COLOR = (0.85, 0.1, 0.1)
+TABLE_CELL_STYLE = "border:0.5pt solid #999;padding:2pt 4pt;vertical-align:middle"
+
+
+# --- Drawing Helpers ---
+def to_rect(x, y, width, height):
+    """Converts an EMU box to a PyMuPDF rectangle in points."""
+    return fitz.Rect(x / EMU_PER_PT, y / EMU_PER_PT, (x + width) / EMU_PER_PT, (y + height) / EMU_PER_PT)
+
+
+def placeholder_rect(placeholder):
+    bounds = get_placeholder_bounds({'PLACEHOLDER': [placeholder]})['PLACEHOLDER']
+    return to_rect(bounds['x'], bounds['y'], bounds['width'], bounds['height'])
+
+
+def markdown_html(text):
+    """Escapes a line and turns its **bold** runs into <b>, as get_rich_text_requests does with text styles."""
+    return re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', html.escape(text))
+
+
+def body_html(body_lines):
+    """Renders body lines the way the builder formats them: '- ' bullets, two-space nesting levels and bold runs."""
+    paragraphs = []
+    for line in body_lines:
+        cleaned_line = line.rstrip()
+        stripped = cleaned_line.lstrip()
+        level = (len(cleaned_line) - len(stripped)) // 2
+        text = stripped.lstrip('- ').strip()
+        if stripped.startswith('- '):
+            paragraphs.append(f'<p style="margin:0">{"&nbsp;" * 4 * level}&bull;&nbsp;{markdown_html(text)}</p>')
+        else:
+            paragraphs.append(f'<p style="margin:0">{markdown_html(text) or "&nbsp;"}</p>')
+    return "".join(paragraphs)
+
+
+def table_html(table_data):
+    """Renders a table with a bold header row and equal column widths, as create_fullscreen_table does."""
+    width = f"{100 / len(table_data['headers']):.2f}%"
+    def cells(tag, values):
+        return "".join(f'<{tag} style="{TABLE_CELL_STYLE};width:{width}">{html.escape(str(v).strip())}</{tag}>' for v in values)
+    rows = [f"<tr>{cells('th', table_data['headers'])}</tr>"] + [f"<tr>{cells('td', row)}</tr>" for row in table_data.get('rows', [])]
+    return f'<table style="width:100%;border-collapse:collapse">{"".join(rows)}</table>'
+
+
+def fits(page, rect, content_html, font_pt):
+    """Draws HTML into a box at its real size. Returns False, drawing nothing, if it does not fit."""
+    spare_height, _ = page.insert_htmlbox(rect, content_html, css=f"* {{font-family: sans-serif; font-size: {font_pt}pt;}}", scale_low=1)
+    return spare_height >= 0
+
+
+def draw_overflowing(page, rect, content_html, font_pt, label):
+    """Draws content that does not fit scaled down into its box, framed and labelled in red."""
+    page.insert_htmlbox(rect, content_html, css=f"* {{font-family: sans-serif; font-size: {font_pt}pt;}}", scale_low=0)
+    page.draw_rect(rect, color=OVERFLOW_COLOR, width=1.5)
+    page.insert_text((rect.x0, rect.y0 - 2), label, fontsize=7, color=OVERFLOW_COLOR)
+
+
+# --- Slide Rendering ---
+def render_slide(page, slide_index, slide_data, json_file_base, layout, options):
+    """Draws one slide and returns its warnings."""
+    layouts, layout_placeholders, page_size = layout['layouts'], layout['layout_placeholders'], layout['page_size']
+    layout_class = slide_data.get('layoutClass', 'default')
+    layout_id = layouts.get(options['class_to_layout_name_map'].get(layout_class))
+    page.insert_text((4, page.rect.height - 4), f"{json_file_base} - slide {slide_index + 1} ({layout_class})", fontsize=6, color=OUTLINE_COLOR)
+    if not layout_id:
+        page.insert_text((36, 36), f"No layout for class '{layout_class}' in {LAYOUT_CACHE_FILE}", fontsize=14, color=OVERFLOW_COLOR)
+        return [f"no layout for class '{layout_class}'"]
+
+    placeholders = {p_type: [] for p_type in PLACEHOLDER_TYPES}
+    for ph in layout_placeholders.get(layout_id, []):
+        if ph['type'] in placeholders:
+            placeholders[ph['type']].append({'objectId': ph['layoutObjectId'], 'transform': ph['transform'], 'size': ph['size']})
+            page.draw_rect(placeholder_rect(placeholders[ph['type']][-1]), color=OUTLINE_COLOR, width=0.5, dashes="[2] 0")
+
+    warnings = []
+    for placeholder, role, content in get_text_assignments(slide_data, layout_class, placeholders, options['placeholder_map'], options['globals_config']):
+        rect = placeholder_rect(placeholder)
+        content_html = body_html(content) if role == 'body' else markdown_html(content)
+        if not fits(page, rect, content_html, FONT_SIZES[role]):
+            draw_overflowing(page, rect, content_html, FONT_SIZES[role], f"{role} overflows")
+            warnings.append(f"{role} text overflows its placeholder at {FONT_SIZES[role]}pt")
+
+    image_ref = slide_data.get('imageReference')
+    if layout_class in ['image_fullscreen', 'image_right'] and image_ref:
+        found_images = glob.glob(os.path.join(IMAGE_DIRECTORY, f"{json_file_base}-slide_{slide_index+1:02d}.*"))
+        if found_images:
+            position = 'fullscreen' if layout_class == 'image_fullscreen' else 'left_half'
+            x, y, width, height = get_image_placement(get_image_aspect_ratio(found_images[0]), page_size, placeholders, position)
+            page.insert_image(to_rect(x, y, width, height), filename=found_images[0], keep_proportion=False)
+        else:
+            warnings.append("no extracted image (run extract-images first)")
+
+    if layout_class == 'table_fullscreen' and slide_data.get('table', {}).get('headers'):
+        # Same fit as the builder: the template font first, then the estimated font if the table overflows.
+        area = get_table_area(placeholders, page_size)
+        rect = to_rect(area['x'], area['y'], area['width'], area['effective_height'])
+        content_html = table_html(slide_data['table'])
+        font_pt = estimate_table_font_size(slide_data['table'], area['effective_height'], options['default_table_font_size'])
+        if not fits(page, rect, content_html, options['default_table_font_size']) and not fits(page, rect, content_html, font_pt):
+            draw_overflowing(page, rect, content_html, font_pt, f"table overflows at {font_pt}pt")
+            warnings.append(f"table overflows its area even at the fitted {font_pt}pt")
+    return warnings
+
+
+def render_deck(json_file, layout, options):
+    """Renders one deck to a PDF (and optionally PNGs). Runs in a worker process."""
+    start = time.time()
+    json_file_base = os.path.splitext(os.path.basename(json_file))[0]
+    deck = load_deck(json_file)
+    slides = deck.get('slides', [])
+    page_width, page_height = layout['page_size']['width']['magnitude'] / EMU_PER_PT, layout['page_size']['height']['magnitude'] / EMU_PER_PT
+
+    # As in the builder, the deck's workshop title fills the header of every slide.
+    options = dict(options, globals_config=dict(options['globals_config'], header=deck.get('workshopTitle', 'Untitled')))
+    warnings = []
+    with fitz.open() as doc:
+        for i, slide_data in enumerate(slides):
+            page = doc.new_page(width=page_width, height=page_height)
+            warnings.extend(f"slide {i+1}: {w}" for w in render_slide(page, i, slide_data, json_file_base, layout, options))
+
+        output_file = os.path.join(options['output_dir'], f"{json_file_base}.pdf")
+        doc.save(output_file, garbage=3, deflate=True)
+        if options['png']:
+            png_dir = os.path.join(options['output_dir'], json_file_base)
+            os.makedirs(png_dir, exist_ok=True)
+            for i, page in enumerate(doc):
+                page.get_pixmap(dpi=options['dpi']).save(os.path.join(png_dir, f"slide_{i+1:02d}.png"))
+    return output_file, len(slides), warnings, time.time() - start
+
+
+def _init_worker(log_level):
+    logging.getLogger().setLevel(log_level)
+
+
+def fetch_layout_cache():
+    """Reads the theme's layouts from the template itself (one masked, read-only API call) and caches them."""
+    # Imported here: the builder reads and checks its .env configuration on import.
+    from build_slides_from_json import authenticate_google, get_theme_and_layouts, TEMPLATE_ID, TARGET_THEME_NAME
+    from slide_layout import save_layout_cache
+    from slides_api import SlidesApi
+
+    slides_service, _ = authenticate_google()
+    if not slides_service: return False
+    master_id, layouts, layout_placeholders, page_size = get_theme_and_layouts(SlidesApi(slides_service), TEMPLATE_ID)
+    if not master_id: return False
+    save_layout_cache(TEMPLATE_ID, TARGET_THEME_NAME, layouts, layout_placeholders, page_size)
+    logging.info(f"✅ Saved the layout geometry of '{TARGET_THEME_NAME}' to '{LAYOUT_CACHE_FILE}'.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders deck JSON files to local PDF/PNG previews, without any API call or upload.")
+    parser.add_argument('files', nargs='*', help=f"Deck JSON files. Defaults to every file in '{JSON_SOURCE_DIR}/'.")
+    parser.add_argument('--output-dir', default=PREVIEW_DIR, help=f"Where to write the previews (default: '{PREVIEW_DIR}/').")
+    parser.add_argument('--png', action='store_true', help="Also write one PNG per slide.")
+    parser.add_argument('--dpi', type=int, default=96, help="PNG resolution (default: 96).")
+    parser.add_argument('--table-font', type=float, default=DEFAULT_TABLE_FONT_PT, help=f"The template's default table font size (default: {DEFAULT_TABLE_FONT_PT}pt).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Decks rendered in parallel (default: one per CPU).")
+    parser.add_argument('--fetch-layouts', action='store_true', help=f"Refresh '{LAYOUT_CACHE_FILE}' from the template first (needs .env and Google access).")
+    parser.add_argument('--verbose', action='store_true', help="Log the computed image and table areas.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    if args.fetch_layouts and not fetch_layout_cache(): sys.exit(1)
+
+    cached = load_layout_cache()
+    if not cached:
+        logging.critical(f"FATAL: No '{LAYOUT_CACHE_FILE}' yet. Run build-slides once, or rerun with --fetch-layouts.")
+        sys.exit(1)
+    layout = dict(zip(['layouts', 'layout_placeholders', 'page_size'], cached))
+
+    with open(LAYOUTS_FILE, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    options = {
+        'class_to_layout_name_map': config.get('layout_mapping', {}),
+        'placeholder_map': config.get('placeholder_mapping', {}),
+        'globals_config': config.get('globals', {}),
+        'default_table_font_size': args.table_font,
+        'output_dir': args.output_dir,
+        'png': args.png,
+        'dpi': args.dpi,
+    }
+    json_files = args.files or sorted(glob.glob(os.path.join(JSON_SOURCE_DIR, '*.json')))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = False
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(json_files) or 1)), initializer=_init_worker,
+                             initargs=(logging.INFO if args.verbose else logging.WARNING,)) as executor:
+        futures = {json_file: executor.submit(render_deck, json_file, layout, options) for json_file in json_files}
+        for json_file, future in futures.items():
+            try:
+                output_file, slide_count, warnings, seconds = future.result()
+            except Exception as e:
+                logging.error(f"❌ Could not render {json_file}. Error: {e}")
+                failed = True
+                continue
+            logging.info(f"✅ Rendered {slide_count} slide(s) of {os.path.basename(json_file)} to '{output_file}' in {seconds:.2f}s.")
+            for warning in warnings:
+                logging.warning(f"  - {warning}")
+    if failed: sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import json
+import logging
+import fitz  # PyMuPDF
+
+# --- Configuration ---
+TABLE_HEIGHT_SAFETY_MARGIN_PERCENT = 0.05 # 5% margin to prevent overlap
+TABLE_SIDE_MARGIN_EMU = 360000 # Standard side margins
+# Layout geometry of the template, saved by each build so slides can be laid out offline.
+LAYOUT_CACHE_FILE = "layout_cache.json"
+
+
+# --- Layout Cache ---
+def save_layout_cache(template_id, theme_name, layouts, layout_placeholders, page_size, cache_file=LAYOUT_CACHE_FILE):
+    """Saves the theme's layouts and placeholder geometry, as returned by the theme lookup."""
+    cache = {'templateId': template_id, 'themeName': theme_name, 'pageSize': page_size, 'layouts': layouts, 'layoutPlaceholders': layout_placeholders}
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        logging.warning(f"Could not save the layout cache to '{cache_file}'. Error: {e}")
+
+
+def load_layout_cache(cache_file=LAYOUT_CACHE_FILE):
+    """Returns (layouts, layout_placeholders, page_size) from the cache, or None if there is none yet."""
+    if not os.path.exists(cache_file):
+        return None
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    return cache['layouts'], cache['layoutPlaceholders'], cache['pageSize']
+
+
+# --- Table Sizing ---
+def estimate_table_font_size(table_data, target_height_emu, start_font_pt=12):
+    """
+    Calculates the optimal font size for a table by estimating row wraps from its JSON content.
+    Pure computation, so it can run while other slides are being sent.
+    """
+    MIN_FONT_PT = 8
+    FONT_STEP = 1
+    # Adjusted ratio for a more accurate height estimation per font point.
+    FONT_HEIGHT_RATIO = 25500
+    # Average characters per line before wrapping. This is an estimate and may need tuning.
+    CHARS_PER_LINE_ESTIMATE = 45
+
+    # The template's default font size comes back from the API as a float.
+    start_font_pt = int(start_font_pt)
+    num_cols = len(table_data.get('headers', []))
+    if not num_cols: return start_font_pt
+    table_rows = [table_data['headers']] + table_data.get('rows', [])
+
+    # --- Pre-calculate estimated number of lines per row ---
+    estimated_lines_per_row = []
+    for row in table_rows:
+        max_lines_in_row = 1
+        for cell_text in row:
+            # The API reports each cell's text with its closing newline, hence the +1.
+            text_content = str(cell_text).strip()
+            text_length = len(text_content) + 1 if text_content else 0
+
+            # Estimate lines based on character count
+            lines_in_cell = max(1, text_length // (CHARS_PER_LINE_ESTIMATE / num_cols))
+            if lines_in_cell > max_lines_in_row:
+                max_lines_in_row = lines_in_cell
+        estimated_lines_per_row.append(max_lines_in_row)
+
+    # --- Mathematical Calculation Loop with Wrapping Estimation ---
+    final_font_pt = start_font_pt
+    for font_pt in range(start_font_pt, MIN_FONT_PT - 1, -FONT_STEP):
+        estimated_row_height = font_pt * FONT_HEIGHT_RATIO
+
+        # Calculate total height based on estimated lines for each row
+        estimated_total_height = sum(estimated_row_height * lines for lines in estimated_lines_per_row)
+
+        logging.debug("  - [Calc] Font: %spt -> Estimated Weighted Height: %d EMU", font_pt, estimated_total_height)
+
+        if estimated_total_height <= target_height_emu:
+            final_font_pt = font_pt
+            break
+        else:
+            final_font_pt = MIN_FONT_PT
+    return final_font_pt
+
+
+def get_table_area(placeholders, page_size):
+    """
+    Computes where a fullscreen table goes: centered between the side margins, from
+    the bottom of the title to the top of the footer. Returns the position, the target
+    size and the effective height after the safety margin, all in EMU.
+    """
+    bounds = get_placeholder_bounds(placeholders)
+    page_width, page_height = page_size['width']['magnitude'], page_size['height']['magnitude']
+
+    target_width_emu = page_width - (2 * TABLE_SIDE_MARGIN_EMU)
+    title_bounds = bounds.get('TITLE')
+    footer_bounds = bounds.get('FOOTER')
+
+    top_y_offset = 0; target_height_emu = page_height
+    if title_bounds: top_y_offset = title_bounds.get('y', 0) + title_bounds.get('height', 0)
+    if footer_bounds: target_height_emu = footer_bounds.get('y', page_height) - top_y_offset
+    else: target_height_emu = page_height - top_y_offset # Fallback if no footer
+
+    pos_x = (page_width - target_width_emu) / 2
+
+    # Apply safety margin
+    effective_target_height = target_height_emu * (1 - TABLE_HEIGHT_SAFETY_MARGIN_PERCENT)
+    logging.info(f"  - Calculated target area for table: "
+                 f"x={int(pos_x)}, y={int(top_y_offset)}, "
+                 f"width={int(target_width_emu)}, height={int(target_height_emu)} (EMU)")
+    logging.info(f"  - Applying {TABLE_HEIGHT_SAFETY_MARGIN_PERCENT*100}% safety margin. Effective height: {int(effective_target_height)} EMU")
+    return {'x': pos_x, 'y': top_y_offset, 'width': target_width_emu, 'height': target_height_emu, 'effective_height': effective_target_height}
+
+
+# --- Placeholders and Images ---
+def get_placeholder_bounds(placeholders):
+    bounds = {}
+    for p_type, p_list in placeholders.items():
+        if p_list:
+            # Sort by vertical position to correctly identify header/footer from multiple SUBTITLE placeholders
+            p_list.sort(key=lambda p: p['transform'].get('translateY', 0))
+
+            p = p_list[0] # Use the first element for the primary placeholder type
+            transform = p.get('transform', {})
+            size = p.get('size', {})
+            scale_x = abs(transform.get('scaleX', 1.0))
+            scale_y = abs(transform.get('scaleY', 1.0))
+            effective_width = size.get('width', {}).get('magnitude', 0) * scale_x
+            effective_height = size.get('height', {}).get('magnitude', 0) * scale_y
+            x = transform.get('translateX', 0)
+            y = transform.get('translateY', 0)
+            bounds[p_type] = {'x': x, 'y': y, 'width': effective_width, 'height': effective_height}
+
+            # Find HEADER and FOOTER from SUBTITLE placeholders if more than one exists
+            if p_type == 'SUBTITLE' and len(p_list) > 1:
+                header, footer = p_list[0], p_list[-1]
+
+                header_transform = header.get('transform', {})
+                header_size = header.get('size', {})
+                header_scale_x = abs(header_transform.get('scaleX', 1.0)); header_scale_y = abs(header_transform.get('scaleY', 1.0))
+                header_width = header_size.get('width', {}).get('magnitude', 0) * header_scale_x
+                header_height = header_size.get('height', {}).get('magnitude', 0) * header_scale_y
+                bounds['HEADER'] = {'x': header_transform.get('translateX', 0), 'y': header_transform.get('translateY', 0), 'width': header_width, 'height': header_height}
+
+                footer_transform = footer.get('transform', {})
+                footer_size = footer.get('size', {})
+                footer_scale_x = abs(footer_transform.get('scaleX', 1.0)); footer_scale_y = abs(footer_transform.get('scaleY', 1.0))
+                footer_width = footer_size.get('width', {}).get('magnitude', 0) * footer_scale_x
+                footer_height = footer_size.get('height', {}).get('magnitude', 0) * footer_scale_y
+                bounds['FOOTER'] = {'x': footer_transform.get('translateX', 0), 'y': footer_transform.get('translateY', 0), 'width': footer_width, 'height': footer_height}
+    return bounds
+
+
+def get_image_aspect_ratio(image_path):
+    try:
+        with fitz.open(image_path) as img_doc:
+            img = img_doc[0]
+            img_width, img_height = img.rect.width, img.rect.height
+            return img_width / img_height if img_height > 0 else 1
+    except Exception as e:
+        logging.error(f"  - Could not get image dimensions for {image_path}. Using default 4:3. Error: {e}")
+        return 4 / 3
+
+
+def get_image_placement(img_aspect_ratio, page_size, placeholders, position='fullscreen'):
+    """
+    Fits an image of the given aspect ratio into its area: below the title and above
+    the footer ('fullscreen'), or left of the main content ('left_half', for image_right).
+    Returns (x, y, width, height) in EMU.
+    """
+    bounds = get_placeholder_bounds(placeholders)
+    page_width, page_height = page_size['width']['magnitude'], page_size['height']['magnitude']
+
+    if position == 'fullscreen':
+        title_bottom = bounds.get('TITLE', {}).get('y', 0) + bounds.get('TITLE', {}).get('height', 0)
+        footer_top = bounds.get('FOOTER', {}).get('y', page_height)
+
+        available_height = footer_top - title_bottom
+        logging.info(f"  - Calculated target area for '{position}' image: x=0, y={int(title_bottom)}, width={int(page_width)}, height={int(available_height)} (EMU)")
+        final_height = available_height
+        final_width = final_height * img_aspect_ratio
+
+        if final_width > page_width:
+            final_width = page_width
+            final_height = final_width / img_aspect_ratio
+
+        pos_x = (page_width - final_width) / 2
+        pos_y = title_bottom
+    else:  # left_half for image_right
+        title_bottom = bounds.get('TITLE', {}).get('y', 0) + bounds.get('TITLE', {}).get('height', 0)
+
+        main_content_subtitle = next((p for p in placeholders.get('SUBTITLE', []) if p['transform'].get('translateY', 0) > title_bottom), None)
+
+        if main_content_subtitle:
+             main_content_bounds = get_placeholder_bounds({'SUBTITLE': [main_content_subtitle]})['SUBTITLE']
+        elif placeholders.get('BODY'):
+             main_content_bounds = get_placeholder_bounds({'BODY': placeholders['BODY']})['BODY']
+        else:
+             main_content_bounds = {'x': 0, 'y': title_bottom, 'width': page_width, 'height': page_height - title_bottom}
+
+        available_height = main_content_bounds['height']
+
+        title_left = bounds.get('TITLE', {}).get('x', 0)
+        main_content_left = main_content_bounds['x']
+        available_width = main_content_left - title_left
+
+        final_height = available_height
+        logging.info(f"  - Calculated target area for '{position}' image: x={int(title_left)}, y={int(main_content_bounds['y'])}, width={int(available_width)}, height={int(available_height)} (EMU)")
+        final_width = final_height * img_aspect_ratio
+
+        if final_width > available_width:
+            final_width = available_width
+            final_height = final_width / img_aspect_ratio
+
+        pos_x = title_left
+        pos_y = main_content_bounds['y'] + (main_content_bounds['height'] - final_height) / 2
+
+    logging.info(f"  - Calculated image properties: ratio={img_aspect_ratio:.2f}, width={int(final_width)}, height={int(final_height)}, x={int(pos_x)}, y={int(pos_y)}")
+    return pos_x, pos_y, final_width, final_height
+
+
+# --- Text Placement ---
+def get_text_assignments(slide_data, layout_class, placeholders, placeholder_map, globals_config):
+    """
+    Decides which placeholder receives each piece of a slide's text. Returns a list of
+    (placeholder, role, content) in request order, where content is a string for the
+    title, subtitle, header and footer, and a list of body lines for 'body'.
+    """
+    assignments = []
+    body_placeholder_type = placeholder_map.get(layout_class, {}).get('body_placeholder', 'BODY')
+
+    if 'title' in slide_data and placeholders.get('TITLE'):
+        assignments.append((placeholders['TITLE'][0], 'title', slide_data['title'].strip()))
+
+    if placeholders.get('SUBTITLE'):
+        placeholders['SUBTITLE'].sort(key=lambda x: x['transform'].get('translateY', 0))
+        subs = placeholders['SUBTITLE']
+
+        # Check if subtitle from JSON exists
+        if slide_data.get('subtitle'):
+            # The main subtitle is usually the one that is NOT a header or footer. Find it.
+            title_bottom = get_placeholder_bounds(placeholders).get('TITLE', {}).get('y', 0)
+            main_sub = next((s for s in subs if s['transform'].get('translateY', 0) > title_bottom), subs[0])
+            assignments.append((main_sub, 'subtitle', slide_data['subtitle'].strip()))
+
+        # Handle global header/footer, avoiding overwriting the main subtitle
+        if layout_class not in ['title', 'closing']:
+            if globals_config.get('header') and len(subs) > 0: assignments.append((subs[0], 'header', globals_config['header']))
+            footer = (placeholders.get('FOOTER') or [None])[0] or (subs[-1] if len(subs) > 1 else None)
+            if globals_config.get('footer') and footer: assignments.append((footer, 'footer', globals_config['footer']))
+
+    if layout_class == 'columns':
+        body_content = slide_data.get('body', [])
+        bold_titles = [i for i, line in enumerate(body_content) if line.strip().startswith('**')]
+        split_index = bold_titles[1] if len(bold_titles) > 1 else -1
+
+        left_body, right_body = (body_content[:split_index], body_content[split_index:]) if split_index != -1 else (body_content, [])
+        body_placeholders = sorted(placeholders.get('BODY', []), key=lambda p: p['transform'].get('translateX', 0))
+
+        if len(body_placeholders) > 0 and left_body:
+            assignments.append((body_placeholders[0], 'body', left_body))
+        if len(body_placeholders) > 1 and right_body:
+            assignments.append((body_placeholders[1], 'body', right_body))
+    elif layout_class == 'image_right':
+        if 'body' in slide_data and placeholders.get(body_placeholder_type):
+            rightmost_subtitle = sorted(placeholders[body_placeholder_type], key=lambda x: x['transform'].get('translateX', 0), reverse=True)[0]
+            assignments.append((rightmost_subtitle, 'body', slide_data['body']))
+    elif layout_class not in ['image_fullscreen', 'table_fullscreen']:
+        if 'body' in slide_data and placeholders.get(body_placeholder_type):
+            assignments.append((placeholders[body_placeholder_type][0], 'body', slide_data['body']))
+    return assignments
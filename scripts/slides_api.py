@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+
+import tracing
+
+# Request types whose effect on the presentation is not limited to the object IDs they name.
+GLOBAL_REQUEST_TYPES = ['replaceAllText', 'replaceAllShapesWithImage', 'replaceAllShapesWithSheetsChart']
+# Request types that change the list of pages, and so every presentation-level read.
+STRUCTURAL_REQUEST_TYPES = ['createSlide', 'deleteObject', 'duplicateObject', 'updateSlidesPosition']
+# Keys whose string (or list of string) values are the object IDs a request touches.
+OBJECT_ID_KEYS = ['objectId', 'pageObjectId', 'pageObjectIds', 'layoutId', 'tableObjectId']
+
+
+def execute(request):
+    """Executes a Google API request, counting it and its request bytes on the open trace spans."""
+    tracing.record_api_call(len(request.body or ''))
+    return request.execute()
+
+
+def collect_object_ids(value, found=None):
+    """Walks a request or response and collects every object ID it names."""
+    found = set() if found is None else found
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in OBJECT_ID_KEYS:
+                if isinstance(item, str):
+                    found.add(item)
+                elif isinstance(item, list):
+                    found.update(i for i in item if isinstance(i, str))
+            else:
+                collect_object_ids(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            collect_object_ids(item, found)
+    return found
+
+
+def replace_object_ids(value, id_map):
+    """Returns a copy of a request with the object IDs in 'id_map' replaced by their new IDs."""
+    if isinstance(value, dict):
+        replaced = {}
+        for key, item in value.items():
+            if key in OBJECT_ID_KEYS and isinstance(item, str):
+                replaced[key] = id_map.get(item, item)
+            elif key in OBJECT_ID_KEYS and isinstance(item, list):
+                replaced[key] = [id_map.get(i, i) for i in item]
+            else:
+                replaced[key] = replace_object_ids(item, id_map)
+        return replaced
+    if isinstance(value, list):
+        return [replace_object_ids(item, id_map) for item in value]
+    return value
+
+
+class SlidesApi:
+    """
+    Thin layer over the Slides service used by the builder. Every read must state
+    a field mask; read responses are memoized for the build and invalidated by the
+    object IDs each batchUpdate touches. Bytes transferred are counted per call site.
+    """
+    def __init__(self, slides_service):
+        self.service = slides_service
+        self._lock = threading.Lock()
+        # (presentation_id, page_id, fields) -> (response, object IDs in the response)
+        self._cache = {}
+        # call site -> {'calls', 'cached', 'request_bytes', 'response_bytes'}
+        self.transfer = {}
+
+    def _count(self, call_site, request_bytes=0, response=None, cached=False):
+        with self._lock:
+            stats = self.transfer.setdefault(call_site, {'calls': 0, 'cached': 0, 'request_bytes': 0, 'response_bytes': 0})
+            if cached:
+                stats['cached'] += 1
+                return
+            stats['calls'] += 1
+            stats['request_bytes'] += request_bytes
+            # The client library hands back parsed JSON; its compact re-serialization approximates the payload size.
+            stats['response_bytes'] += len(json.dumps(response, separators=(',', ':'))) if response else 0
+
+    def _read(self, key, request, call_site):
+        if not key[2]:
+            raise ValueError(f"Slides API read at '{call_site}' must state a field mask.")
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached:
+            self._count(call_site, cached=True)
+            return cached[0]
+        response = execute(request)
+        self._count(call_site, len(request.body or ''), response)
+        with self._lock:
+            self._cache[key] = (response, collect_object_ids(response) | ({key[1]} if key[1] else set()))
+        return response
+
+    def get_presentation(self, presentation_id, fields, call_site):
+        request = self.service.presentations().get(presentationId=presentation_id, fields=fields)
+        return self._read((presentation_id, None, fields), request, call_site)
+
+    def get_page(self, presentation_id, page_id, fields, call_site):
+        request = self.service.presentations().pages().get(presentationId=presentation_id, pageObjectId=page_id, fields=fields)
+        return self._read((presentation_id, page_id, fields), request, call_site)
+
+    def batch_update(self, presentation_id, requests, call_site):
+        """Sends a batchUpdate, dropping first every cached read that involves an object it touches."""
+        self.invalidate(presentation_id, requests)
+        request = self.service.presentations().batchUpdate(presentationId=presentation_id, body={"requests": requests})
+        response = execute(request)
+        self._count(call_site, len(request.body or ''), response)
+        return response
+
+    def invalidate(self, presentation_id, requests):
+        """
+        Drops the cached reads a batch of requests makes stale: every read naming a
+        touched object ID, every presentation-level read when pages are created,
+        deleted or moved, and everything when a request is presentation-wide.
+        """
+        touched, structural, presentation_wide = set(), False, False
+        for request in requests:
+            request_type = next(iter(request), None)
+            if request_type in GLOBAL_REQUEST_TYPES and not request[request_type].get('pageObjectIds'):
+                presentation_wide = True
+            elif request_type in STRUCTURAL_REQUEST_TYPES:
+                structural = True
+            collect_object_ids(request, touched)
+        with self._lock:
+            for key, (_, object_ids) in list(self._cache.items()):
+                if key[0] != presentation_id:
+                    continue
+                if presentation_wide or (structural and key[1] is None) or touched & object_ids:
+                    del self._cache[key]
+
+    def log_transfer_report(self):
+        """Logs the calls, cache hits and bytes transferred per call site."""
+        logging.info("--- Slides API transfer by call site ---")
+        logging.info(f"  {'call site':<28} {'calls':>6} {'cached':>7} {'req bytes':>11} {'resp bytes':>11}")
+        for call_site, stats in sorted(self.transfer.items(), key=lambda item: item[1]['response_bytes'], reverse=True):
+            logging.info(f"  {call_site:<28} {stats['calls']:>6} {stats['cached']:>7} {stats['request_bytes']:>11} {stats['response_bytes']:>11}")
@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import json
+import fcntl
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+# --- Configuration ---
+SERVICE_NAME = "workshop-pipeline"
+METRIC_PREFIX = "workshop_pipeline"
+
+_local = threading.local()
+_lock = threading.Lock()
+_finished_spans = []
+_trace_id = os.urandom(16).hex()
+# Tells apart the traces of runs that overlap, e.g. extractions run in parallel by the pipeline.
+RUN_ID = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{os.getpid()}"
+PROMETHEUS_SAMPLE = re.compile(r'^(\w+)\{service="([^"]*)",phase="([^"]*)"\} (\S+)$')
+
+
+class Span:
+    """A timed phase of the pipeline with its API-call, request-byte and retry counters."""
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.api_calls = 0
+        self.request_bytes = 0
+        self.retries = 0
+        self.error = None
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """
+    Times a phase of the pipeline. Spans nest per thread; pass 'parent'
+    explicitly to attach a span started on a worker thread to its caller.
+    """
+    stack = _stack()
+    new_span = Span(name, parent or (stack[-1] if stack else None), attributes)
+    stack.append(new_span)
+    try:
+        yield new_span
+    except Exception as e:
+        new_span.error = str(e)
+        raise
+    finally:
+        new_span.end_ns = time.time_ns()
+        stack.pop()
+        with _lock:
+            _finished_spans.append(new_span)
+
+
+def traced(name):
+    """Decorator form of span() for functions that make up a whole phase."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Counters are charged to every open span of the calling thread, so they are inclusive.
+def record_api_call(request_bytes=0):
+    for open_span in _stack():
+        open_span.api_calls += 1
+        open_span.request_bytes += request_bytes
+
+
+def record_retry():
+    for open_span in _stack():
+        open_span.retries += 1
+
+
+def finished_spans():
+    with _lock:
+        return list(_finished_spans)
+
+
+# --- Exporters ---
+def run_file(file_path):
+    """Names a file after this run: 'generation_trace.json' -> 'generation_trace-20260101T120000Z-4242.json'."""
+    stem, ext = os.path.splitext(file_path)
+    return f"{stem}-{RUN_ID}{ext}"
+
+
+def _write_atomically(file_path, text):
+    """Replaces a file in one step, so readers and concurrent writers never see it half-written."""
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, file_path)
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otel_span(s):
+    attributes = dict(s.attributes, **{"api.calls": s.api_calls, "http.request.bytes": s.request_bytes, "retries": s.retries})
+    otel_span = {
+        "traceId": _trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otel_value(v)} for k, v in attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        otel_span["parentSpanId"] = s.parent_id
+    return otel_span
+
+
+def export_otel_json(file_path, service_name=SERVICE_NAME):
+    """Writes the finished spans as an OTLP/JSON trace export, replacing the file atomically."""
+    export = {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": [_otel_span(s) for s in finished_spans()]}],
+    }]}
+    _write_atomically(file_path, json.dumps(export, indent=2))
+
+
+def phase_totals():
+    """Aggregates the finished spans per phase name."""
+    totals = {}
+    for s in finished_spans():
+        phase = totals.setdefault(s.name, {'count': 0, 'seconds': 0.0, 'api_calls': 0, 'request_bytes': 0, 'retries': 0, 'errors': 0})
+        phase['count'] += 1
+        phase['seconds'] += s.duration
+        phase['api_calls'] += s.api_calls
+        phase['request_bytes'] += s.request_bytes
+        phase['retries'] += s.retries
+        phase['errors'] += 1 if s.error else 0
+    return totals
+
+
+def _read_prometheus_counters(file_path):
+    """Reads the samples of an earlier textfile export as {(metric, service, phase): value}."""
+    counters = {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if sample := PROMETHEUS_SAMPLE.match(line.strip()):
+                    metric, service, phase, value = sample.groups()
+                    counters[(metric, service, phase)] = float(value)
+    except FileNotFoundError:
+        pass
+    return counters
+
+
+def export_prometheus_textfile(file_path, service_name=SERVICE_NAME):
+    """
+    Adds this run's per-phase metrics to the counters already in the Prometheus
+    textfile, so runs that finish one after another or at once all count. Writers
+    take turns on a lock file, and the textfile is replaced atomically.
+    """
+    metrics = [
+        ('phase_duration_seconds_sum', 'counter', 'Total time spent in the phase.', 'seconds'),
+        ('phase_duration_seconds_count', 'counter', 'Number of times the phase ran.', 'count'),
+        ('phase_api_calls_total', 'counter', 'Google API calls made in the phase.', 'api_calls'),
+        ('phase_request_bytes_total', 'counter', 'Request bytes sent to Google APIs in the phase.', 'request_bytes'),
+        ('phase_retries_total', 'counter', 'Retried requests in the phase.', 'retries'),
+        ('phase_errors_total', 'counter', 'Failed runs of the phase.', 'errors'),
+    ]
+    totals = phase_totals()
+    with open(f"{file_path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        counters = _read_prometheus_counters(file_path)
+        lines = []
+        for metric, metric_type, help_text, key in metrics:
+            name = f"{METRIC_PREFIX}_{metric}"
+            for phase, values in totals.items():
+                counters[(name, service_name, phase)] = counters.get((name, service_name, phase), 0) + values[key]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (sample_name, service, phase), value in sorted(counters.items()):
+                if sample_name == name:
+                    lines.append(f'{name}{{service="{service}",phase="{phase}"}} {int(value) if float(value).is_integer() else value}')
+        _write_atomically(file_path, "\n".join(lines) + "\n")
+
+
+def export(trace_file, metrics_file, service_name=SERVICE_NAME):
+    """
+    Exports this run's trace to its own file (see run_file()) and adds its metrics to
+    the shared textfile, logging (not raising) on failure so a finished build is never lost.
+    """
+    trace_file = run_file(trace_file)
+    try:
+        export_otel_json(trace_file, service_name)
+        export_prometheus_textfile(metrics_file, service_name)
+        logging.info(f"Wrote trace to '{trace_file}' and metrics to '{metrics_file}'.")
+    except OSError as e:
+        logging.warning(f"Could not export trace or metrics. Error: {e}")
+
+
+def log_profile_report(slowest=10):
+    """Logs the slowest slides and the time, API calls, bytes and retries per phase."""
+    spans = finished_spans()
+    slides = sorted((s for s in spans if s.name == 'slide'), key=lambda s: s.duration, reverse=True)[:slowest]
+    logging.info("\n--- Profile: slowest slides ---")
+    for s in slides:
+        logging.info(f"  {s.duration:8.2f}s  {s.attributes.get('deck', '')} slide {s.attributes.get('slide', '?')} "
+                     f"({s.attributes.get('layoutClass', '')}): {s.api_calls} API calls, {s.request_bytes} bytes, {s.retries} retries")
+
+    logging.info("--- Profile: phases by total time ---")
+    logging.info(f"  {'phase':<20} {'count':>6} {'total s':>9} {'mean s':>8} {'API calls':>10} {'req bytes':>11} {'retries':>8}")
+    for phase, values in sorted(phase_totals().items(), key=lambda item: item[1]['seconds'], reverse=True):
+        logging.info(f"  {phase:<20} {values['count']:>6} {values['seconds']:>9.2f} {values['seconds'] / values['count']:>8.2f} "
+                     f"{values['api_calls']:>10} {values['request_bytes']:>11} {values['retries']:>8}")
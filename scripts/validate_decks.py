@@ -0,0 +1,251 @@
+import os
+import sys
+import logging
+import json
+import glob
+import re
+import argparse
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+
+from workshop_sources import load_ad_repository, load_agenda, find_session
+from deck_json import load_deck
+
+# --- Configuration ---
+JSON_SOURCE_DIR = "json_source"
+IMAGE_DIRECTORY = "extracted_images"
+LAYOUTS_FILE = "layouts.yaml"
+MAX_WORKERS = 8
+
+# Regex for an AD ID anywhere in a text, e.g. "OCP-NET-01".
+AD_ID_PATTERN = re.compile(r'\b([A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*-\d{2,})\b')
+# Regex for an Agenda slide line that is an AD topic, e.g. "- **OCP-NET-01**: Machine IP Range".
+# Free-form items that only mention an AD ("- Review `OCP-NET-15` ...") do not match.
+AGENDA_TOPIC_PATTERN = re.compile(rf'^\s*-\s+[*`]*{AD_ID_PATTERN.pattern}[*`]*\s*:')
+
+# --- Deck Schema ---
+# A field spec is a type, a [spec] list of items, or a {'fields', 'required'} object.
+SLIDE_SCHEMA = {
+    'fields': {
+        'layoutClass': str,
+        'title': str,
+        'subtitle': str,
+        'body': [str],
+        'speakerNotes': str,
+        'adId': str,
+        'workshopContext': str,
+        'table': {
+            'fields': {'headers': [str], 'rows': [[(str, int, float)]]},
+            'required': ['headers', 'rows'],
+        },
+        'imageReference': {
+            'fields': {'sourceFile': str, 'pageNumber': int, 'caption': str},
+            'required': ['sourceFile', 'pageNumber'],
+        },
+    },
+    'required': [],
+}
+
+DECK_SCHEMA = {
+    'fields': {'workshopTitle': str, 'slides': [SLIDE_SCHEMA]},
+    'required': ['workshopTitle', 'slides'],
+}
+
+
+def _type_name(expected):
+    if isinstance(expected, tuple):
+        return " or ".join(t.__name__ for t in expected)
+    return expected.__name__
+
+
+def compile_schema(spec):
+    """
+    Compiles a schema spec into a checker function once, so validating many
+    slides does not walk the spec again. The checker returns a list of
+    (path, message) tuples.
+    """
+    if isinstance(spec, dict):
+        field_checkers = {name: compile_schema(sub) for name, sub in spec['fields'].items()}
+        required = spec.get('required', [])
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return [(path, f"expected an object, got {type(value).__name__}")]
+            errors = [(path, f"missing required field '{name}'") for name in required if name not in value]
+            for name, checker in field_checkers.items():
+                if name in value:
+                    errors.extend(checker(value[name], f"{path}.{name}" if path else name))
+            return errors
+        return check_object
+
+    if isinstance(spec, list):
+        item_checker = compile_schema(spec[0])
+
+        def check_list(value, path):
+            if not isinstance(value, list):
+                return [(path, f"expected a list, got {type(value).__name__}")]
+            errors = []
+            for i, item in enumerate(value):
+                errors.extend(item_checker(item, f"{path}[{i}]"))
+            return errors
+        return check_list
+
+    def check_type(value, path):
+        # bool is a subclass of int, but never a valid page number or cell.
+        if isinstance(value, bool) or not isinstance(value, spec):
+            return [(path, f"expected {_type_name(spec)}, got {type(value).__name__}")]
+        return []
+    return check_type
+
+
+check_deck_schema = compile_schema(DECK_SCHEMA)
+
+
+# --- Reference Data ---
+def load_reference_data():
+    """Loads everything the checks compare against, once for all deck files."""
+    with open(LAYOUTS_FILE, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    return {
+        'layout_classes': set(config.get('layout_mapping', {})),
+        'ads': load_ad_repository(),
+        'sessions': load_agenda(),
+    }
+
+
+# --- Checks ---
+def check_slide(slide, slide_number, json_file_base, reference, check_images):
+    """
+    Checks a single slide against layouts.yaml, the AD repository and the extracted images.
+    Fields of the wrong type are left to the schema check and skipped here.
+    """
+    problems = []
+    layout_class = slide.get('layoutClass', 'default')
+    if not isinstance(layout_class, str):
+        layout_class = ''
+    elif layout_class not in reference['layout_classes']:
+        problems.append(f"unknown layoutClass '{layout_class}' (not in {LAYOUTS_FILE})")
+
+    if isinstance(table := slide.get('table'), dict):
+        headers, rows = table.get('headers') or [], table.get('rows') or []
+        if not headers:
+            problems.append("table has no headers")
+        for r, row in enumerate(rows if isinstance(rows, list) else []):
+            if isinstance(row, list) and len(row) != len(headers):
+                problems.append(f"table row {r+1} has {len(row)} cells, expected {len(headers)} (one per header)")
+    elif layout_class == 'table_fullscreen':
+        problems.append("'table_fullscreen' slide has no table")
+
+    if layout_class.startswith('image_'):
+        if 'imageReference' not in slide:
+            problems.append(f"'{layout_class}' slide has no imageReference")
+        elif check_images and not glob.glob(os.path.join(IMAGE_DIRECTORY, f"{json_file_base}-slide_{slide_number:02d}.*")):
+            problems.append(f"no extracted image '{json_file_base}-slide_{slide_number:02d}.*' in '{IMAGE_DIRECTORY}' (run extract-images first)")
+
+    if isinstance(ad_id := slide.get('adId'), str) and ad_id and ad_id not in reference['ads']:
+        problems.append(f"AD '{ad_id}' is not in the AD repository")
+    return problems
+
+
+def check_agenda_order(deck, reference):
+    """Checks that the deck's AD topics and Agenda slide follow the session order in agenda.md."""
+    if not isinstance(workshop_title := deck.get('workshopTitle'), str):
+        return []
+    session = find_session(reference['sessions'], workshop_title)
+    if not session:
+        logging.debug(f"  - Workshop '{deck.get('workshopTitle')}' not found in agenda.md. Skipping agenda order checks.")
+        return []
+
+    problems = []
+    agenda_ids = [t['adId'] for t in session['topics'] if t['adId']]
+    position = {ad_id: i for i, ad_id in enumerate(agenda_ids)}
+
+    slides = [s for s in deck.get('slides', []) if isinstance(s, dict)]
+    deck_ids = []
+    for slide in slides:
+        if isinstance(ad_id := slide.get('adId'), str) and ad_id and ad_id not in deck_ids:
+            deck_ids.append(ad_id)
+    for ad_id in deck_ids:
+        if ad_id not in position:
+            problems.append(f"AD '{ad_id}' is not on the agenda of '{session['workshopTopic']}'")
+    ordered = [ad_id for ad_id in deck_ids if ad_id in position]
+    for previous, current in zip(ordered, ordered[1:]):
+        if position[current] < position[previous]:
+            problems.append(f"AD '{current}' comes after '{previous}' but precedes it in agenda.md")
+
+    agenda_slide = next((s for s in slides if s.get('layoutClass') == 'agenda'), None)
+    if agenda_slide and isinstance(body := agenda_slide.get('body', []), list):
+        listed = [m.group(1) for line in body if isinstance(line, str) and (m := AGENDA_TOPIC_PATTERN.match(line))]
+        if listed and listed != agenda_ids:
+            problems.append(f"Agenda slide lists {listed}, expected {agenda_ids}")
+        unknown = [ad_id for ad_id in listed if ad_id not in reference['ads']]
+        problems.extend(f"Agenda slide lists AD '{ad_id}', which is not in the AD repository" for ad_id in unknown)
+    return problems
+
+
+def validate_deck_file(file_path, reference, check_images=True):
+    """Validates one deck file and returns all of its problems as 'file: location: message' strings."""
+    file_name = os.path.basename(file_path)
+    try:
+        deck = load_deck(file_path)
+    except (OSError, json.JSONDecodeError) as e:
+        return [f"{file_name}: invalid JSON: {e}"]
+    return validate_deck(deck, file_name, reference, check_images)
+
+
+def validate_deck(deck, file_name, reference, check_images=True):
+    """Validates deck data, e.g. a deck about to be written, as if it were the file 'file_name'."""
+    problems = [f"{file_name}: {path or 'deck'}: {message}" for path, message in check_deck_schema(deck, "")]
+    if not isinstance(deck, dict) or not isinstance(deck.get('slides'), list):
+        return problems
+
+    json_file_base = os.path.splitext(file_name)[0]
+    for i, slide in enumerate(deck['slides']):
+        if isinstance(slide, dict):
+            problems.extend(f"{file_name}: slide {i+1}: {p}" for p in check_slide(slide, i + 1, json_file_base, reference, check_images))
+    problems.extend(f"{file_name}: {p}" for p in check_agenda_order(deck, reference))
+    return problems
+
+
+def validate_decks(json_files=None, check_images=True):
+    """
+    Validates every deck file in parallel and logs all problems at once.
+    Returns True when every deck is valid.
+    """
+    json_files = json_files if json_files is not None else sorted(glob.glob(os.path.join(JSON_SOURCE_DIR, '*.json')))
+    if not json_files:
+        return True
+
+    try:
+        reference = load_reference_data()
+    except (OSError, yaml.YAMLError) as e:
+        logging.critical(f"FATAL: Could not load validation reference data. Error: {e}")
+        return False
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(lambda path: validate_deck_file(path, reference, check_images), json_files))
+
+    problems = [p for file_problems in results for p in file_problems]
+    if problems:
+        logging.error(f"❌ Deck validation found {len(problems)} problem(s) in {sum(1 for r in results if r)} of {len(json_files)} file(s):")
+        for problem in problems:
+            logging.error(f"  - {problem}")
+        return False
+
+    logging.info(f"✅ Deck validation passed for {len(json_files)} file(s).")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validates deck JSON files offline, before any API call or upload.")
+    parser.add_argument('files', nargs='*', help=f"Deck JSON files. Defaults to every file in '{JSON_SOURCE_DIR}/'.")
+    parser.add_argument('--skip-images', action='store_true', help="Do not require extracted images (e.g. before extract-images has run).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] - %(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    if not validate_decks(args.files or None, check_images=not args.skip_images):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import re
+import glob
+import logging
+
+# --- Configuration ---
+AGENDA_FILE = "agenda.md"
+AD_REPOSITORY_DIR = "ad_repository"
+
+# Regex for an AD heading in the repository, e.g. "## OCP-NET-01: Machine IP Range"
+AD_HEADING_PATTERN = re.compile(r'^##\s+([A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*-\d+):\s*(.+?)\s*$')
+# Regex for a bold section label alone on its line, e.g. "**Architectural Question**" (possibly indented)
+AD_LABEL_PATTERN = re.compile(r'^\s*\*\*([^*]+)\*\*\s*$')
+# Regex for a session heading in the agenda, e.g. "#### **AM Session: Networking Deep Dive**"
+SESSION_HEADING_PATTERN = re.compile(r'^####\s+\**(.+?)\**\s*$')
+# Regex for the workshop topic line of a session.
+WORKSHOP_TOPIC_PATTERN = re.compile(r'^-\s+\*\*Workshop Topic:\*\*\s*(.+?)\s*$')
+# Regex for an AD sub-topic line, e.g. "  - `OCP-NET-01`: Machine IP Range # comment"
+AD_SUBTOPIC_PATTERN = re.compile(r'^`([A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*-\d+)`:\s*(.+?)\s*$')
+
+# The labels used in the AD repository, in the order they appear in each AD.
+AD_LABELS = [
+    'Architectural Question',
+    'Issue or Problem',
+    'Assumption',
+    'Alternatives',
+    'Decision',
+    'Justification',
+    'Implications',
+    'Agreeing Parties',
+]
+
+
+def _strip_comment(text):
+    """Removes a trailing '# ...' annotation from an agenda line."""
+    return re.sub(r'\s+#\s.*$', '', text).strip()
+
+
+def _trim_blank_lines(lines):
+    """Removes leading and trailing blank lines from a list of lines."""
+    while lines and not lines[0].strip():
+        lines = lines[1:]
+    while lines and not lines[-1].strip():
+        lines = lines[:-1]
+    return lines
+
+
+def parse_ad_file(file_path):
+    """
+    Parses a single AD repository Markdown file into a dictionary keyed by AD ID.
+    Each AD keeps its section content verbatim, as a list of lines per label.
+    """
+    ads = {}
+    current_ad, current_label = None, None
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            line = raw_line.rstrip()
+
+            if heading := AD_HEADING_PATTERN.match(line):
+                ad_id, title = heading.groups()
+                current_ad = {'id': ad_id, 'title': title, 'sections': {}, 'source': os.path.basename(file_path), 'line': line_number}
+                ads[ad_id] = current_ad
+                current_label = None
+                continue
+
+            if current_ad is None:
+                continue
+            if line.strip() == '---' or line.startswith('# '):
+                current_ad, current_label = None, None
+                continue
+
+            if label := AD_LABEL_PATTERN.match(line):
+                current_label = label.group(1).strip()
+                current_ad['sections'][current_label] = []
+                continue
+
+            if current_label:
+                current_ad['sections'][current_label].append(line)
+
+    for ad in ads.values():
+        ad['sections'] = {label: _trim_blank_lines(lines) for label, lines in ad['sections'].items()}
+    return ads
+
+
+def load_ad_repository(repository_dir=AD_REPOSITORY_DIR):
+    """Loads every AD from the repository directory into a single dictionary keyed by AD ID."""
+    ads = {}
+    for file_path in sorted(glob.glob(os.path.join(repository_dir, '*.md'))):
+        for ad_id, ad in parse_ad_file(file_path).items():
+            if ad_id in ads:
+                logging.warning(f"Duplicate AD '{ad_id}' in '{ad['source']}' (already defined in '{ads[ad_id]['source']}'). Keeping the first one.")
+                continue
+            ads[ad_id] = ad
+    return ads
+
+
+def load_agenda(agenda_file=AGENDA_FILE):
+    """
+    Parses agenda.md into an ordered list of sessions. Each session has a
+    'workshopTopic' and its 'topics' in agenda order; a topic is either an
+    AD reference ({'adId', 'title'}) or a free-form item ({'adId': None, 'title'}).
+    """
+    sessions = []
+    current_session, in_subtopics = None, False
+
+    with open(agenda_file, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.rstrip()
+            stripped = line.strip()
+
+            if heading := SESSION_HEADING_PATTERN.match(line):
+                current_session = {'session': heading.group(1), 'workshopTopic': None, 'topics': []}
+                sessions.append(current_session)
+                in_subtopics = False
+                continue
+
+            if current_session is None:
+                continue
+
+            if topic := WORKSHOP_TOPIC_PATTERN.match(stripped):
+                current_session['workshopTopic'] = topic.group(1)
+                in_subtopics = False
+            elif stripped.startswith('- **Sub-Topics:**'):
+                in_subtopics = True
+            elif stripped.startswith('- **'):
+                in_subtopics = False
+            elif in_subtopics and line.startswith('  ') and stripped.startswith('- '):
+                item = _strip_comment(stripped[2:])
+                if ad_ref := AD_SUBTOPIC_PATTERN.match(item):
+                    current_session['topics'].append({'adId': ad_ref.group(1), 'title': ad_ref.group(2)})
+                else:
+                    current_session['topics'].append({'adId': None, 'title': item})
+            elif line.startswith('#'):
+                current_session, in_subtopics = None, False
+
+    return [s for s in sessions if s['workshopTopic']]
+
+
+def find_session(sessions, workshop_title):
+    """Returns the agenda session whose workshop topic matches the given title (case-insensitive)."""
+    wanted = workshop_title.strip().lower()
+    return next((s for s in sessions if s['workshopTopic'].lower() == wanted), None)
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from deck_json import parse_deck
+
+
+def parse_string(value):
+    """Parses a single JSON string and returns its cleaned value."""
+    return parse_deck(json.dumps(value))[0]
+
+
+class CitationStrippingTest(unittest.TestCase):
+    def test_bullet_opening_tag_keeps_bullet_marker(self):
+        self.assertEqual(parse_string("- [cite_start]Bullet one [cite: 1]"), "- Bullet one")
+
+    def test_nested_bullet_keeps_indentation(self):
+        self.assertEqual(parse_string("  - [cite_start]Nested"), "  - Nested")
+
+    def test_mid_sentence_opening_tag_keeps_word_gap(self):
+        self.assertEqual(parse_string("First point. [cite_start]Second point."), "First point. Second point.")
+
+    def test_trailing_closing_tag_drops_its_whitespace(self):
+        self.assertEqual(parse_string("Closing sentence. [cite: 3, 12]"), "Closing sentence.")
+
+    def test_closing_tag_between_sentences(self):
+        self.assertEqual(parse_string("One. [cite: 1] Two."), "One. Two.")
+
+    def test_deck_body_lines(self):
+        text = '{"slides": [{"body": ["- [cite_start]**Point:** text [cite: 4]", "  - [cite_start]Detail [cite: 5]"]}]}'
+        data, repairs = parse_deck(text)
+        self.assertEqual(data['slides'][0]['body'], ["- **Point:** text", "  - Detail"])
+        self.assertEqual(len(repairs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from workshop_sources import load_ad_repository, AD_LABELS
+
+
+class AdRepositoryTest(unittest.TestCase):
+    def test_every_ad_has_every_label(self):
+        ads = load_ad_repository(os.path.join(ROOT, 'ad_repository'))
+        self.assertTrue(ads)
+        for ad_id, ad in ads.items():
+            with self.subTest(ad=ad_id):
+                self.assertEqual(list(ad['sections']), AD_LABELS)
+
+    def test_indented_label_starts_its_own_section(self):
+        ad = load_ad_repository(os.path.join(ROOT, 'ad_repository'))['OCP-BM-01']
+        self.assertFalse(any('Agreeing Parties' in line for line in ad['sections']['Implications']))
+        self.assertTrue(any('Enterprise Architect' in line for line in ad['sections']['Agreeing Parties']))
+
+
+if __name__ == "__main__":
+    unittest.main()